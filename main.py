@@ -1,189 +1,416 @@
-import cv2
 import time
-import os
+IMPORT_START = time.perf_counter()
+
+import cv2
 import sys
+import argparse
+import numpy as np
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.config import Config
-from src.core.camera import VideoStream
+from src.core.camera import VideoStream, open_stream
+from src.core.pipeline import Pipeline, FramePacket
+from src.core.frame import Frame
 from src.core.analyzer import EmotionAnalyzer
+from src.core.face_detector import RoiFaceDetector, create_face_detector
+from src.core.face_tracker import FaceTracker
+from src.core.adaptive_controller import AdaptiveController
+from src.core.recorder import Recorder
 from src.ui.visualizer import Visualizer
 from src.utils.fps_counter import FPSCounter
+from src.utils.benchmark import ThroughputMeter
+from src.utils.profiler import StageProfiler, StartupTimer
+from src.utils.latency import LatencyMonitor
 from src.core.background_generator import BackgroundGenerator
-import pygame
-pygame.mixer.init()
-happy_sound = pygame.mixer.Sound("sounds/yaaa!.wav")
-bg_generator = BackgroundGenerator()
-
-# Try MediaPipe first, fallback to simple detector
-try:
-    import os
-    import cv2
-    import mediapipe as mp
-    from mediapipe.tasks import python
-    from mediapipe.tasks.python import vision
-
-    # Absolute path to your model (avoid Windows path nonsense)
-    BASE_DIR = os.path.dirname(__file__)
-    MODEL_PATH = os.path.join(BASE_DIR, "models", "blaze_face_short_range.tflite")
-
-    # Create FaceDetector
-    base_options = python.BaseOptions(model_asset_path=MODEL_PATH)
-    options = vision.FaceDetectorOptions(
-        base_options=base_options,
-        running_mode=vision.RunningMode.VIDEO
-    )
-    face_detector = vision.FaceDetector.create_from_options(options)
-
-    print("✅ MediaPipe FaceDetector initialized")
-    USE_MEDIAPIPE = True
 
+# TensorFlow, DeepFace, MediaPipe and pygame are imported on first use
+IMPORT_SECONDS = time.perf_counter() - IMPORT_START
 
-    
-except ImportError:
-    from src.core.face_detector import SimpleFaceDetector
-    USE_MEDIAPIPE = False
-    print("⚠️  MediaPipe not available, using OpenCV Haar Cascade fallback")
+# Runtime components, created by init_runtime(). Keeping them out of module
+# scope lets worker processes re-import this module without side effects.
+happy_sound = None
+bg_generator = None
+face_detector = None
+
+def load_sound():
+    global happy_sound
+    import pygame
+    pygame.mixer.init()
+    happy_sound = pygame.mixer.Sound("sounds/yaaa!.wav")
+
+def init_runtime(seg_width=Config.SEGMENTATION_WIDTH, background_dirs=Config.BACKGROUND_DIRS, startup=None,
+                 segmentation_process=Config.SEGMENTATION_PROCESS):
+    global bg_generator, face_detector
+    startup = startup or StartupTimer()
+
+    # Audio is only needed on the first background switch
+    startup.in_background("sound", load_sound)
+
+    with startup.step("segmenter"):
+        bg_generator = BackgroundGenerator(seg_width=seg_width, background_dirs=background_dirs,
+                                           use_process=segmentation_process)
+
+    # Try MediaPipe first, fallback to simple detector
+    with startup.step("face detector"):
+        face_detector = create_face_detector()
+
+def to_processing(captured, width, keep_source=False):
+    """
+    Returns a mirrored copy of a captured Frame at the processing width
+    (0 = capture width). With keep_source the mirrored full-resolution
+    frame stays reachable as frame.source.
+    """
+    bgr = captured.bgr
+    h, w = bgr.shape[:2]
+    if not width or width >= w:
+        return Frame(cv2.flip(bgr, 1), captured.index, captured.timestamp)
+
+    size = (width, max(1, round(h * width / w)))
+    if keep_source:
+        full = Frame(cv2.flip(bgr, 1), captured.index, captured.timestamp)
+        small = cv2.resize(full.bgr, size, interpolation=cv2.INTER_AREA)
+        return Frame(small, captured.index, captured.timestamp, source=full)
+    # Resize first so the flip only touches the small image
+    small = cv2.flip(cv2.resize(bgr, size, interpolation=cv2.INTER_AREA), 1)
+    return Frame(small, captured.index, captured.timestamp)
+
+def fit(frame, width, height):
+    """Scales a BGR image to fit inside width x height, keeping its aspect ratio (0 = leave as is)."""
+    h, w = frame.shape[:2]
+    if not width or not height:
+        return frame
+    scale = min(width / w, height / h)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    if size == (w, h):
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Advanced Emotion Analytics System")
+    parser.add_argument("--source", default=str(Config.CAMERA_ID),
+                        help="Camera index, video file or directory of images")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without opening a display window")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Pace file sources to their original timestamps")
+    parser.add_argument("--max-frames", type=int, default=0,
+                        help="Stop after this many frames (0 = until the source ends)")
+    parser.add_argument("--profile-hud", action="store_true",
+                        help="Draw per-stage p50/p95/p99 timings on the HUD")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Append per-frame stage timings to a JSONL trace")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Run detection, segmentation and rendering as parallel stages")
+    parser.add_argument("--detect-interval", type=int, default=Config.DETECT_INTERVAL,
+                        help="Run the face detector every N frames and track faces in between")
+    parser.add_argument("--seg-width", type=int, default=None,
+                        help="Internal segmentation width in pixels (0 = full; default: "
+                             "Config.SEGMENTATION_WIDTH, or chosen by the adaptive controller)")
+    parser.add_argument("--backgrounds", action="append", default=[], metavar="DIR",
+                        help="Extra background folder (<emotion>.jpg files or <emotion>/ packs)")
+    parser.add_argument("--latency-budget", type=float, default=Config.LATENCY_BUDGET_MS, metavar="MS",
+                        help="Skip frames older than this at any stage (0 = process every frame)")
+    parser.add_argument("--no-adaptive", action="store_true", default=not Config.ADAPTIVE,
+                        help="Use the fixed ANALYSIS_THROTTLE/segmentation settings instead of adapting to FPS")
+    parser.add_argument("--analysis-backend", choices=["thread", "process"], default=Config.ANALYSIS_BACKEND,
+                        help="Run emotion inference in worker threads or worker processes")
+    parser.add_argument("--process-width", type=int, default=Config.PROCESS_WIDTH,
+                        help="Resize frames to this width right after capture (0 = capture resolution)")
+    parser.add_argument("--segmentation-process", action="store_true", default=Config.SEGMENTATION_PROCESS,
+                        help="Segment in a worker process and composite with the newest mask available")
+    parser.add_argument("--full-res-crops", action="store_true", default=Config.FULL_RES_FACE_CROPS,
+                        help="Cut face crops for emotion analysis from the full-resolution capture")
+    parser.add_argument("--record", action="store_true",
+                        help="Record from the first frame (also toggled with 'r')")
+    return parser.parse_args(argv)
+
+class FrameProcessor:
+    """
+    The per-frame stages of the main loop. The serial loop calls them one
+    after the other; the pipelined engine runs each on its own thread, so
+    every stage only keeps state it alone touches.
+    """
+    def __init__(self, analyzer, visualizer, profiler, latency, profile_hud=False,
+                 detect_interval=Config.DETECT_INTERVAL, full_res_crops=False):
+        self.analyzer = analyzer
+        self.visualizer = visualizer
+        self.profiler = profiler
+        self.latency = latency
+        self.profile_hud = profile_hud
+        self.analysis_every = Config.ANALYSIS_THROTTLE
+        self.controller = None
+        self.fps_counter = FPSCounter(window_size=30)
+        self.face_detection = RoiFaceDetector(face_detector)
+        self.tracker = FaceTracker(detect_interval=detect_interval)
+        self.full_res_crops = full_res_crops
+
+    def detect(self, packet):
+        if self.latency.should_drop(packet.frame.timestamp, "detect"):
+            return None
+        frame = packet.frame.bgr
+        h, w, _ = frame.shape
+
+        # 1. Detect Faces (full detector every few frames, tracked in between)
+        with self.profiler.stage("detect", packet.timings):
+            if self.tracker.needs_detection():
+                # Search around the faces already tracked, rescanning everything now and then
+                known = [box for _, box in self.tracker.active()]
+                tracks = self.tracker.update(self._run_detector(packet.frame, known))
+            else:
+                tracks = self.tracker.predict()
+
+            # Boxes are in processing coordinates; crops may come from the full-res capture
+            source = packet.frame.source if self.full_res_crops else None
+            crop_from = source.bgr if source is not None else frame
+            s = crop_from.shape[1] / w
+
+            track_ids = []
+            for track_id, (x, y, bw, bh) in tracks[:Config.MAX_FACES]:
+                x, y = max(0, x), max(0, y)
+                bw, bh = min(w - x, bw), min(h - y, bh)
+
+                if bw > 0 and bh > 0:
+                    packet.face_imgs.append(crop_from[int(y*s):int((y+bh)*s), int(x*s):int((x+bw)*s)])
+                    packet.faces.append((x, y, bw, bh))
+                    track_ids.append(track_id)
+
+        # 2. Analyze Emotion (throttled for performance, all faces in one batch)
+        if packet.face_imgs and packet.index % self.analysis_every == 0:
+            with self.profiler.stage("analyze.submit", packet.timings):
+                self.analyzer.analyze(packet.face_imgs, keys=track_ids,
+                                      captured=packet.frame.timestamp, frame_index=packet.frame.index)
+
+        # 3. Get Results (snapshot travels with the frame)
+        packet.emotion, packet.probs = self.analyzer.get_results()
+        info = self.analyzer.get_result_info()
+        packet.result_frame, packet.result_captured = info["frame"], info["captured"]
+        face_results = self.analyzer.get_face_results()
+        packet.face_emotions = [face_results.get(t, (packet.emotion, None))[0] for t in track_ids]
+        return packet
+
+    def _run_detector(self, frame, known=None):
+        """Returns raw (x, y, w, h) face boxes in the Frame's (processing) coordinates."""
+        return self.face_detection.detect(frame, known)
+
+    def composite(self, packet):
+        if self.latency.should_drop(packet.frame.timestamp, "composite"):
+            return None
+        prev_bg = bg_generator.get_current_background()
+
+        # background removal
+        if packet.probs is not None:
+            with self.profiler.stage("segment", packet.timings):
+                packet.frame = packet.frame.replace(bg_generator.apply(packet.frame, packet.probs))
+
+        ## play happy sound
+        current_bg = bg_generator.get_current_background()
+
+        if current_bg == "happy" and prev_bg != "happy":
+            try:
+                happy_sound.play()
+            except Exception as e:
+                print(f"Sound error: {e}")
+        return packet
+
+    def render(self, packet):
+        if self.latency.should_drop(packet.frame.timestamp, "render"):
+            return None
+        # 4. Visualize
+        with self.profiler.stage("hud", packet.timings):
+            frame = packet.frame.bgr
+            for face_coords, emotion in zip(packet.faces, packet.face_emotions):
+                self.visualizer.draw_face_box(frame, face_coords, emotion)
+
+            # Calculate FPS
+            self.fps_counter.update()
+            fps = self.fps_counter.get_fps()
+
+            self.visualizer.draw_hud(frame, packet.emotion, packet.probs, fps)
+            if self.profile_hud:
+                self.visualizer.draw_profile(frame, self.profiler.summary())
+            if self.controller:
+                self.visualizer.draw_adaptive(frame, self.controller.decisions())
+            packet.frame.invalidate()
+        return packet
 
-def main():
+def main(argv=None):
+    global IMPORT_SECONDS
+    args = parse_args(argv)
     print("🚀 Starting Advanced Emotion Analytics System...")
+    # Only the first run in a process pays for (and counts) the imports
+    startup = StartupTimer(start=IMPORT_START if IMPORT_SECONDS else None)
+    startup.add("imports", IMPORT_SECONDS)
+    IMPORT_SECONDS = 0.0
+    seg_width = Config.SEGMENTATION_WIDTH if args.seg_width is None else args.seg_width
+    init_runtime(seg_width=seg_width, background_dirs=args.backgrounds + Config.BACKGROUND_DIRS,
+                 startup=startup, segmentation_process=args.segmentation_process)
+    # Warm up at the size frames will have after to_processing()
+    width = min(args.process_width or Config.CAMERA_WIDTH, Config.CAMERA_WIDTH)
+    height = round(Config.CAMERA_HEIGHT * width / Config.CAMERA_WIDTH)
+    startup.in_background("segmenter warm-up", bg_generator.warm_up, width, height)
     
     # 1. Initialize Components
-    camera = VideoStream(src=Config.CAMERA_ID, width=Config.CAMERA_WIDTH, height=Config.CAMERA_HEIGHT).start()
-    analyzer = EmotionAnalyzer()
+    with startup.step("camera"):
+        camera = open_stream(args.source, width=Config.CAMERA_WIDTH, height=Config.CAMERA_HEIGHT,
+                             realtime=args.realtime).start()
+    with startup.step("emotion model"):
+        analyzer = EmotionAnalyzer(backend=args.analysis_backend)
+    startup.in_background("emotion warm-up", analyzer.warm_up)
     analyzer.start()
     visualizer = Visualizer()
     
-    # Face Detection
-    if not USE_MEDIAPIPE:
-        face_detection = SimpleFaceDetector()
-
+    # Throughput / latency over the whole run
+    meter = ThroughputMeter()
+    
+    # Per-stage timings (analyzer worker reports into the same profiler)
+    profiler = StageProfiler(window=Config.PROFILE_WINDOW, trace_path=args.trace)
+    analyzer.profiler = profiler
     
-    # FPS Calculation
-    fps_counter = FPSCounter(window_size=30)
+    # Capture-to-output latency and the optional stale-frame budget
+    latency = LatencyMonitor(budget_ms=args.latency_budget)
+    analyzer.max_age = latency.budget
+    
+    processor = FrameProcessor(analyzer, visualizer, profiler, latency, profile_hud=args.profile_hud,
+                               detect_interval=args.detect_interval, full_res_crops=args.full_res_crops)
+    # Warm the raw detector at the size the front-end feeds it, leaving the front-end's counters alone
+    blank = Frame(np.zeros((height, width, 3), dtype=np.uint8)).scaled(processor.face_detection.width)
+    startup.in_background("detector warm-up", face_detector.detect, blank)
     
     # Recording
-    recording = False
-    out = None
+    recorder = Recorder().start() if args.record else None
     
     # Frame counter for throttling
     frame_count = 0
     
+    def capture():
+        nonlocal frame_count
+        captured = camera.read()
+        if captured is None:
+            return None
+        # Mirror and resize to the processing size (into our own buffer, so the capture slot goes back right away)
+        frame = to_processing(captured, args.process_width, keep_source=args.full_res_crops)
+        captured.release()
+        packet = FramePacket(frame_count, frame)
+        frame_count += 1
+        return packet
+    
+    # Adaptive throttling of analysis and segmentation
+    controller = None
+    if not args.no_adaptive:
+        # Values given explicitly on the command line stay fixed
+        fixed = {"seg_width": args.seg_width} if args.seg_width is not None else None
+        controller = AdaptiveController(target_fps=Config.FPS, pipelined=args.pipeline, fixed=fixed)
+        controller.apply(processor, analyzer, bg_generator)
+        processor.controller = controller
+        print(f"⚙️  Adaptive level {controller.level}: {controller.describe()}")
+    
+    # Warm-up threads use the same models as the stages: finish before any frame is processed
+    startup.wait()
+    startup_summary = startup.report()
+    
+    pipeline = None
+    if args.pipeline:
+        # Unpaced file replay must process every frame, so it gets backpressure
+        live = isinstance(camera, VideoStream) or args.realtime
+        pipeline = Pipeline(
+            capture,
+            [("detect", processor.detect), ("composite", processor.composite), ("render", processor.render)],
+            queue_size=Config.PIPELINE_QUEUE_SIZE,
+            drop_oldest=Config.PIPELINE_DROP_OLDEST and live,
+        ).start()
+        print("🧵 Pipelined processing enabled")
+    
     print("✅ System Ready. Press 'q' to exit, 'r' to toggle recording.")
     
+    processed = 0
     try:
-        video_ts = 0
         while True:
-            frame = camera.read()
-            if frame is None: break
-            
-            # Flip for mirror effect
-            frame = cv2.flip(frame, 1)
-            h, w, _ = frame.shape
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # 1. Detect Face
-            face_img = None
-            face_coords = None
-            
-            if USE_MEDIAPIPE:
-                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-                video_ts += 1
-                result = face_detector.detect_for_video(mp_image, video_ts)
-
-
-                if result.detections is not None and len(result.detections) > 0:
-                    for det in result.detections:
-                        bbox = det.bounding_box
-                        x, y, bw, bh = bbox.origin_x, bbox.origin_y, bbox.width, bbox.height
-
-                        x, y = max(0, x), max(0, y)
-                        bw, bh = min(w - x, bw), min(h - y, bh)
-
-                        if bw > 0 and bh > 0:
-                            face_img = frame[y:y+bh, x:x+bw]
-                            face_coords = (x, y, bw, bh)
-                            break
-
+            if pipeline:
+                packet = pipeline.get()
+                if packet is None: break
             else:
-                # OpenCV Haar Cascade detection
-                faces = face_detection.detect(frame)
-                if len(faces) > 0:
-                    x, y, bw, bh = faces[0]  # Use first face
-                    face_img = frame[y:y+bh, x:x+bw]
-                    face_coords = (x, y, bw, bh)
+                packet = capture()
+                if packet is None: break
+                for stage in (processor.detect, processor.composite, processor.render):
+                    packet = stage(packet)
+                    if packet is None: break
+                if packet is None: continue
             
-            # 2. Analyze Emotion (throttled for performance)
-            if face_img is not None and frame_count % Config.ANALYSIS_THROTTLE == 0:
-                analyzer.analyze(face_img)
-            
-            frame_count += 1
-            prev_emotion = None
-
-            # 3. Get Results
-            emotion, probs = analyzer.get_results()
-
-            prev_bg = bg_generator.get_current_background()
-
-            # background removal
-            if probs is not None:
-                frame = bg_generator.apply(frame, probs)
-            
-            ## play happy sound
-            current_bg = bg_generator.get_current_background()
-
-            if current_bg == "happy" and prev_bg != "happy":
-                try:
-                    happy_sound.play()
-                except Exception as e:
-                    print(f"Sound error: {e}")
-
-            prev_bg = current_bg
-
-
-            # 4. Visualize
-            if face_coords:
-                visualizer.draw_face_box(frame, face_coords, emotion)
-                
-            # Calculate FPS
-            fps_counter.update()
-            fps = fps_counter.get_fps()
-            
-            visualizer.draw_hud(frame, emotion, probs, fps)
+            frame = packet.frame.bgr
+            h, w, _ = frame.shape
             
             # Recording Indicator
-            if recording:
-                cv2.circle(frame, (w - 30, 30), 10, (0, 0, 255), -1)
-                if out: out.write(frame)
+            if recorder:
+                with profiler.stage("record", packet.timings):
+                    cv2.circle(frame, (w - 30, 30), 10, (0, 0, 255), -1)
+                    recorder.write(frame, packet.frame.timestamp)
             
-            cv2.imshow(Config.WINDOW_NAME, frame)
+            if not args.headless:
+                with profiler.stage("display", packet.timings):
+                    cv2.imshow(Config.WINDOW_NAME, fit(frame, Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT))
+            elapsed = time.perf_counter() - packet.started
+            meter.record(elapsed)
+            profiler.record("frame", elapsed, packet.timings)
+            profiler.record("glass_to_glass", latency.record_output(packet.frame.timestamp), packet.timings)
+            if packet.result_captured is not None:
+                # How old the emotion shown on this frame is (capture of its source frame to output)
+                profiler.record("result_age", latency.age(packet.result_captured), packet.timings)
+            if controller and controller.update(packet.timings):
+                controller.apply(processor, analyzer, bg_generator)
+            profiler.end_frame(packet.timings)
+
+            processed += 1
+            if args.max_frames and processed >= args.max_frames:
+                break
+            if args.headless:
+                continue
             
             # Controls
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 break
             elif key == ord('r'):
-                recording = not recording
-                if recording:
-                    filename = f"recording_{int(time.time())}.avi"
-                    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                    out = cv2.VideoWriter(filename, fourcc, 20.0, (w, h))
-                    print(f"🔴 Recording started: {filename}")
+                if recorder is None:
+                    recorder = Recorder().start()
+                    print("🔴 Recording started")
                 else:
-                    if out: out.release()
-                    print("⚪ Recording stopped")
+                    print(f"⚪ Recording stopped: {recorder.stop()}")
+                    recorder = None
 
     except KeyboardInterrupt:
         pass
     finally:
         print("🛑 Shutting down...")
+        if pipeline:
+            dropped = {name: st["dropped"] for name, st in pipeline.stats().items() if st["dropped"]}
+            pipeline.stop()
+            if dropped:
+                print(f"   Pipeline drops: {dropped}")
         camera.stop()
+        print(f"   Capture frames: {camera.stats()}")
+        print(f"   Segmentation: {bg_generator.stats()}")
+        bg_generator.close()
+        print(f"   Face detection: {processor.face_detection.stats()}")
         analyzer.stop()
-        if out: out.release()
-        cv2.destroyAllWindows()
+        print(f"   Analyzer crops: {analyzer.get_stats()}")
+        if recorder:
+            print(f"   Recording: {recorder.stop()}")
+        if not args.headless:
+            cv2.destroyAllWindows()
+        summary = meter.report()
+        summary["glass_to_glass"] = latency.summary()
+        summary["startup"] = startup_summary
+        g2g = summary["glass_to_glass"]
+        if "p50" in g2g:
+            print(f"   Glass-to-glass: p50 {g2g['p50']:.1f}ms | p95 {g2g['p95']:.1f}ms | "
+                  f"p99 {g2g['p99']:.1f}ms | skipped {g2g['skipped']}")
+        profiler.report()
+        profiler.close()
+
+    return summary
 
 if __name__ == "__main__":
     main()
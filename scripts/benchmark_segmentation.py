@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Segmentation resolution benchmark
+Runs the selfie segmenter at several internal widths over a fixed input and
+reports segmentation FPS and mask agreement (IoU) with the full-resolution mask.
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import Config
+from src.core.camera import FileStream
+from src.core.background_generator import BackgroundGenerator
+
+
+def load_frames(source, max_frames, width):
+    stream = FileStream(source)
+    frames = []
+    while not max_frames or len(frames) < max_frames:
+        frame = stream.read()
+        if frame is None:
+            break
+        frame = frame.bgr
+        if width and frame.shape[1] != width:
+            height = round(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height))
+        frames.append(frame)
+    stream.stop()
+    return frames
+
+
+def run(frames, seg_width, edge_refine):
+    generator = BackgroundGenerator(seg_width=seg_width, edge_refine=edge_refine, motion_gate=False)
+    masks = []
+    start = time.perf_counter()
+    for frame in frames:
+        masks.append(generator.segment(frame))
+    elapsed = time.perf_counter() - start
+    return masks, len(frames) / elapsed if elapsed > 0 else 0.0
+
+
+def iou(a, b):
+    a, b = a > 127, b > 127
+    union = np.logical_or(a, b).sum()
+    return 1.0 if union == 0 else np.logical_and(a, b).sum() / union
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segmentation resolution vs quality")
+    parser.add_argument("source", help="Video file or directory of images")
+    parser.add_argument("--widths", default="0,1280,960,640,480,320",
+                        help="Comma separated internal widths (0 = full resolution)")
+    parser.add_argument("--edge-refine", type=int, default=Config.SEGMENTATION_EDGE_REFINE)
+    parser.add_argument("--frame-width", type=int, default=Config.CAMERA_WIDTH,
+                        help="Resize input frames to this width first (0 = keep)")
+    parser.add_argument("--max-frames", type=int, default=300)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.max_frames, args.frame_width)
+    if not frames:
+        print("❌ No frames read from source")
+        return 1
+    h, w = frames[0].shape[:2]
+    print(f"🎞️  {len(frames)} frames at {w}x{h}")
+
+    reference, ref_fps = run(frames, 0, 0)
+    print(f"{'width':>8} {'fps':>8} {'mean IoU':>9} {'min IoU':>8}")
+    print(f"{'full':>8} {ref_fps:8.1f} {1.0:9.4f} {1.0:8.4f}")
+    for width in [int(v) for v in args.widths.split(",") if int(v)]:
+        masks, fps = run(frames, width, args.edge_refine)
+        scores = [iou(m, r) for m, r in zip(masks, reference) if m is not None and r is not None]
+        mean_iou = float(np.mean(scores)) if scores else 0.0
+        min_iou = float(np.min(scores)) if scores else 0.0
+        print(f"{width:>8} {fps:8.1f} {mean_iou:9.4f} {min_iou:8.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FER model comparison
+Measures inference latency of the Keras model against converted TFLite
+models and, when the FER2013 test split is available
+(data/fer2013/test/<emotion>/*), their accuracy and agreement.
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import Config
+from src.core.inference import load_custom_model, predict_batch
+from src.utils.benchmark import percentile_summary
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_test_set(directory, per_class):
+    """Returns (images, labels) for the emotions the app uses."""
+    images, labels = [], []
+    for emotion in Config.EMOTIONS:
+        folder = os.path.join(directory, emotion)
+        if not os.path.isdir(folder):
+            continue
+        names = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names[:per_class or None]:
+            img = cv2.imread(os.path.join(folder, name))
+            if img is not None:
+                images.append(img)
+                labels.append(emotion)
+    return images, labels
+
+
+def time_calls(model, crops, repeats):
+    samples = []
+    predict_batch(model, crops)  # warm-up
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        predict_batch(model, crops)
+        samples.append(time.perf_counter() - t0)
+    return percentile_summary(samples, (50, 95, 99))
+
+
+def evaluate(model, images, batch_size):
+    predictions = []
+    for i in range(0, len(images), batch_size):
+        for probs in predict_batch(model, images[i:i + batch_size]):
+            predictions.append(max(probs, key=probs.get) if probs else None)
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Keras and TFLite FER models")
+    parser.add_argument("models", nargs="*",
+                        help="Model files (.hdf5/.h5/.keras/.tflite); default: the Keras and TFLite paths from Config")
+    parser.add_argument("--data", default=str(Path(__file__).parent.parent / "data" / "fer2013" / "test"),
+                        help="FER2013-style test folder with one subfolder per emotion")
+    parser.add_argument("--per-class", type=int, default=200, help="Test images per emotion (0 = all)")
+    parser.add_argument("--repeats", type=int, default=200, help="Timed calls per batch size")
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    args = parser.parse_args()
+
+    paths = args.models or [p for p in (Config.MODEL_PATH, Config.TFLITE_MODEL_PATH) if os.path.exists(p)]
+    models = {}
+    for path in paths:
+        model = load_custom_model(path)
+        if model is not None:
+            models[os.path.basename(path)] = model
+    if not models:
+        print("❌ No models could be loaded")
+        return 1
+
+    images, labels = load_test_set(args.data, args.per_class) if os.path.isdir(args.data) else ([], [])
+    crops = images or [np.random.default_rng(0).integers(0, 256, (96, 96, 3), dtype=np.uint8)]
+
+    print("⏱️  Latency per predict call (ms)")
+    print(f"{'model':<32} {'batch':>5} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for name, model in models.items():
+        for n in [int(v) for v in args.batch_sizes.split(",")]:
+            batch = [crops[i % len(crops)] for i in range(n)]
+            s = time_calls(model, batch, args.repeats)
+            print(f"{name:<32} {n:>5} {s['p50']:7.2f} {s['p95']:7.2f} {s['p99']:7.2f}")
+
+    if not images:
+        print(f"⚠️ No test images in {args.data}; skipping accuracy (run scripts/download_dataset.py)")
+        return 0
+
+    print(f"\n🎯 Accuracy on {len(images)} images from {args.data}")
+    reference = None
+    for name, model in models.items():
+        predictions = evaluate(model, images, batch_size=32)
+        accuracy = np.mean([p == l for p, l in zip(predictions, labels)])
+        line = f"{name:<32} accuracy {accuracy:.4f}"
+        if reference is None:
+            reference = predictions
+        else:
+            agreement = np.mean([p == r for p, r in zip(predictions, reference)])
+            line += f" | agrees with {next(iter(models))} on {agreement:.4f}"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
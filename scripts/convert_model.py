@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FER model converter
+Exports the Keras emotion model to TensorFlow Lite for the lightweight
+TFLite inference path, optionally quantized to float16 or int8.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import Config
+from src.core.inference import preprocess_batch
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def calibration_images(directory, limit):
+    """Face crops for int8 calibration: any images below directory (e.g. data/fer2013/train)."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+    rng = np.random.default_rng(0)
+    for path in rng.permutation(paths)[:limit]:
+        img = cv2.imread(str(path))
+        if img is not None:
+            yield img
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Keras FER model to TFLite")
+    parser.add_argument("--model", default=Config.MODEL_PATH, help="Keras model to convert")
+    parser.add_argument("--output", default=Config.TFLITE_MODEL_PATH, help="Where to write the .tflite file")
+    parser.add_argument("--quantize", choices=["none", "float16", "int8"], default="none",
+                        help="Post-training quantization")
+    parser.add_argument("--calibration", default=str(Path(__file__).parent.parent / "data" / "fer2013" / "train"),
+                        help="Image folder used to calibrate int8 quantization")
+    parser.add_argument("--calibration-size", type=int, default=300)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found: {args.model}")
+        return 1
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model, compile=False)
+    print(f"📦 Loaded {args.model} (input {model.input_shape})")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if args.quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif args.quantize == "int8":
+        if not os.path.isdir(args.calibration):
+            print(f"❌ int8 needs calibration images; folder not found: {args.calibration}")
+            print("💡 Run scripts/download_dataset.py or pass --calibration DIR")
+            return 1
+
+        def representative_dataset():
+            for img in calibration_images(args.calibration, args.calibration_size):
+                yield [preprocess_batch(model, [img])]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    tflite_model = converter.convert()
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "wb") as f:
+        f.write(tflite_model)
+
+    size_kb = len(tflite_model) / 1024
+    original_kb = os.path.getsize(args.model) / 1024
+    print(f"✅ Wrote {args.output} ({size_kb:.0f} KB, Keras file {original_kb:.0f} KB, quantization: {args.quantize})")
+    print("💡 Compare with: python scripts/compare_models.py")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
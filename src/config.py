@@ -3,7 +3,7 @@ import os
 class Config:
     # Window Settings
     WINDOW_NAME = "Advanced Emotion Analytics"
-    WINDOW_WIDTH = 1280
+    WINDOW_WIDTH = 1280   # Display size; frames are scaled to it once before showing (0 = as processed)
     WINDOW_HEIGHT = 720
     FPS = 60
     
@@ -11,15 +11,94 @@ class Config:
     CAMERA_ID = 0
     CAMERA_WIDTH = 1920
     CAMERA_HEIGHT = 1080
+    CAPTURE_BUFFERS = 4  # Preallocated frames in the capture ring buffer
+    PROCESS_WIDTH = 1280  # Frames are resized to this width right after capture (0 = capture size)
+    FULL_RES_FACE_CROPS = False  # Cut face crops for analysis from the full-resolution capture
     
     # Model Settings
     # Path to the pre-trained model if available
     MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tiny_XCEPTION_KDEF.hdf5')
     USE_DEEPFACE = True
     USE_CUSTOM_MODEL = True
+    # Converted model from scripts/convert_model.py, used instead of MODEL_PATH when present
+    TFLITE_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'tiny_XCEPTION_KDEF.tflite')
+    USE_TFLITE = True
+    TFLITE_THREADS = 1
+
+    # Cascade: DeepFace re-scores crops the custom model is unsure about
+    CASCADE = True
+    CASCADE_MIN_CONFIDENCE = 0.45   # Escalate if the top emotion is below this
+    CASCADE_MIN_MARGIN = 0.15       # ...or within this of the runner-up
+    CASCADE_ON_DISAGREEMENT = True  # ...or differs from the face's smoothed label
+    CASCADE_MAX_ESCALATIONS = 2     # DeepFace calls per batch at most
+
+    # Result cache: skip inference for faces whose crop barely changed
+    EMOTION_CACHE = True
+    EMOTION_CACHE_SIZE = 32         # Faces remembered at most
+    EMOTION_CACHE_TTL = 1.0         # Seconds before a cached prediction must be refreshed
+    EMOTION_CACHE_THRESHOLD = 4.0   # Max mean abs difference (gray levels, 48x48) to reuse
     
     # Performance Settings
-    ANALYSIS_THROTTLE = 3  # Analyze every N frames to improve performance
+    ANALYSIS_THROTTLE = 3  # Analyze every N frames to improve performance (when not adaptive)
+    
+    # Adaptive throttling: levels from best quality to cheapest, picked at
+    # runtime to hold FPS. seg_width 0 means full resolution.
+    ADAPTIVE = True
+    ADAPTIVE_START_LEVEL = 1
+    ADAPTIVE_LEVELS = [
+        {"analysis_every": 2, "analysis_interval": 0.10, "segment_every": 1, "seg_width": 960},
+        {"analysis_every": 3, "analysis_interval": 0.21, "segment_every": 1, "seg_width": 640},
+        {"analysis_every": 4, "analysis_interval": 0.30, "segment_every": 2, "seg_width": 480},
+        {"analysis_every": 6, "analysis_interval": 0.50, "segment_every": 2, "seg_width": 320},
+        {"analysis_every": 10, "analysis_interval": 1.00, "segment_every": 3, "seg_width": 256},
+    ]
+    ANALYSIS_WORKERS = 1   # Long-lived emotion inference worker threads
+    ANALYSIS_BACKEND = "thread"  # "thread" (in-process) or "process" (worker processes)
+    INFERENCE_CROP_SIZE = 224    # Max crop side copied to inference processes
+    MAX_FACES = 8                # Faces analyzed per frame (one batch)
+    FACE_STATE_TTL = 2.0         # Seconds before an unseen face's emotion state is dropped
+    
+    # Segmentation
+    SEGMENTATION_WIDTH = 640       # Internal segmentation width in pixels (0 = full frame)
+    SEGMENTATION_EDGE_REFINE = 5   # Odd blur kernel applied to the mask before upsampling (0 = off)
+    SEGMENTATION_SOFT_MASK = True  # Blend with the confidence mask (soft edges) instead of a hard cut
+    SEGMENTATION_SOFT_LOW = 0.3    # Background confidence at or below this is fully foreground
+    SEGMENTATION_SOFT_HIGH = 0.7   # ...at or above this fully background; only the band between is soft
+    SEGMENTATION_PROCESS = False   # Segment in a worker process; frames use the newest mask available
+    MOTION_GATE = True             # Reuse the last mask while the scene is static
+    MOTION_WIDTH = 160             # Width of the grayscale copy used for motion checks
+    MOTION_TILES = 8               # Motion is scored on a MOTION_TILES x MOTION_TILES grid
+    MOTION_THRESHOLD = 6.0         # Mean abs difference (gray levels) in any tile that counts as motion
+    MAX_MASK_AGE = 15              # Re-segment at least every N frames
+    
+    # Backgrounds
+    BACKGROUND_DIRS = []         # Extra background folders searched before backgrounds/
+    BACKGROUND_CACHE_MB = 96     # Memory cap for decoded and resized backgrounds
+    
+    # Face Detection
+    DETECT_WIDTH = 640            # Detector input width (0 = full resolution)
+    DETECT_ROI_MARGIN = 1.0       # Search around known faces, grown by this x box size per side
+    DETECT_FULL_SCAN_EVERY = 5    # Every Nth detector run scans the whole frame for new faces
+
+    # Face Tracking
+    DETECT_INTERVAL = 3          # Run the full face detector every N frames
+    TRACK_IOU_THRESHOLD = 0.3    # Min IoU to match a detection to a track
+    TRACK_MIN_CONFIDENCE = 0.5   # Re-detect early when a track decays below this
+    TRACK_MAX_MISSED = 1         # Detector runs a track may miss before it is dropped
+    PROFILE_WINDOW = 120   # Frames kept for rolling stage percentiles
+    LATENCY_BUDGET_MS = 0  # Skip frames older than this since capture (0 = never skip)
+    PIPELINE_QUEUE_SIZE = 2      # Max frames waiting between pipeline stages
+    PIPELINE_DROP_OLDEST = True  # Drop stale frames instead of blocking capture
+
+    # Recording
+    RECORD_FOURCC = "XVID"
+    RECORD_EXTENSION = ".avi"
+    RECORD_QUEUE_SIZE = 32       # Frames buffered for the writer thread before dropping
+    RECORD_FPS_PROBE = 30        # Frames used to measure the frame rate of each file
+    RECORD_MAX_SECONDS = 600     # Start a new file after this much video (0 = no limit)
+    RECORD_MAX_MB = 2048         # Start a new file at this size on disk (0 = no limit)
+    RECORD_WIDTH = 0             # Recording size, scaled on the writer thread (0 = as processed)
+    RECORD_HEIGHT = 0
     
     # Analysis Settings
     ANALYSIS_INTERVAL = 0.1  # Seconds between emotion checks
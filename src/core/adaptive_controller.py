@@ -0,0 +1,102 @@
+"""
+Feedback controller that trades analysis/segmentation quality for frame rate
+"""
+from src.config import Config
+
+
+class AdaptiveController:
+    """
+    Holds the frame rate near target_fps by moving along Config.ADAPTIVE_LEVELS,
+    a ladder of settings from best quality (level 0) to cheapest.
+
+    Each frame update() gets the per-stage timings (ms) of that frame. Its
+    cost is the sum of the stages in serial mode, or the slowest stage when
+    stages run in parallel. An exponential average of that cost is compared
+    with the frame budget (1 / target_fps): above budget for `patience`
+    frames steps down a level, below budget * headroom for twice as long
+    steps back up. After a change the controller waits `cooldown` frames so
+    the new settings can take effect before judging again.
+
+    Settings in `fixed` (e.g. a seg_width given on the command line) keep
+    their value at every level; the controller only moves the others.
+    """
+    def __init__(self, target_fps=Config.FPS, levels=Config.ADAPTIVE_LEVELS,
+                 start_level=Config.ADAPTIVE_START_LEVEL, pipelined=False,
+                 patience=15, cooldown=45, headroom=0.6, alpha=0.1, fixed=None):
+        self.budget_ms = 1000.0 / target_fps
+        self.levels = levels
+        self.level = min(max(0, start_level), len(levels) - 1)
+        self.pipelined = pipelined
+        self.patience = patience
+        self.cooldown = cooldown
+        self.headroom = headroom
+        self.alpha = alpha
+        self.fixed = dict(fixed or {})
+        self.cost_ms = None
+        self.over = 0
+        self.under = 0
+        self.hold = 0
+
+    def update(self, timings):
+        """Feeds one frame's {stage: ms}; returns True if the level changed."""
+        costs = [ms for name, ms in timings.items()
+                 if name not in ("frame", "glass_to_glass", "result_age") and not name.startswith("analyzer.")]
+        if not costs:
+            return False
+        cost = max(costs) if self.pipelined else sum(costs)
+        self.cost_ms = cost if self.cost_ms is None else self.alpha * cost + (1 - self.alpha) * self.cost_ms
+
+        if self.hold > 0:
+            self.hold -= 1
+            return False
+
+        if self.cost_ms > self.budget_ms:
+            self.over += 1
+            self.under = 0
+        elif self.cost_ms < self.budget_ms * self.headroom:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+
+        if self.over >= self.patience and self.level < len(self.levels) - 1:
+            return self._set_level(self.level + 1)
+        if self.under >= 2 * self.patience and self.level > 0:
+            return self._set_level(self.level - 1)
+        return False
+
+    def _set_level(self, level):
+        self.level = level
+        self.over = self.under = 0
+        self.hold = self.cooldown
+        print(f"⚙️  Adaptive level {level}: {self.describe()} (frame cost {self.cost_ms:.1f}ms, "
+              f"budget {self.budget_ms:.1f}ms)")
+        return True
+
+    def settings(self):
+        """Settings of the current level with the fixed ones applied."""
+        settings = dict(self.levels[self.level])
+        settings.update(self.fixed)
+        return settings
+
+    def decisions(self):
+        """Current settings plus the controller state, for the HUD and logs."""
+        settings = self.settings()
+        settings["level"] = self.level
+        settings["cost_ms"] = self.cost_ms or 0.0
+        settings["budget_ms"] = self.budget_ms
+        return settings
+
+    def describe(self):
+        d = self.settings()
+        width = d["seg_width"] or "full"
+        return (f"analyze 1/{d['analysis_every']} @ {d['analysis_interval']:.2f}s, "
+                f"segment 1/{d['segment_every']} @ {width}px")
+
+    def apply(self, processor, analyzer, bg_generator):
+        """Pushes the current settings into the components that use them."""
+        d = self.settings()
+        processor.analysis_every = d["analysis_every"]
+        analyzer.deepface_interval = d["analysis_interval"]
+        bg_generator.segment_every = d["segment_every"]
+        bg_generator.seg_width = d["seg_width"]
@@ -1,18 +1,37 @@
-import os
-import cv2
-import numpy as np
 import time
 import threading
-from deepface import DeepFace
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import img_to_array
+from queue import Empty
 from src.config import Config
+from src.core.emotion_cache import EmotionCache
+from src.core.inference import create_backend
+from src.core.stabilizer import Stabilizer
+from src.utils.queues import DropOldestQueue
 
 class EmotionAnalyzer:
-    def __init__(self):
+    """
+    Runs emotion inference on long-lived worker threads.
+
+    analyze() drops the crops of one frame into a single-slot mailbox where
+    a newer batch replaces one that has not been picked up yet, so callers
+    never block and no thread is created per call. Workers run at most one
+    inference per deepface_interval, scoring all faces of the batch at once.
+
+    Each face is identified by a key (its index in the frame unless the
+    caller passes stable ids) and keeps its own smoothing state.
+    get_results() reports the first face of the latest batch.
+
+    The models run in a backend: "thread" runs them in the worker threads,
+    "process" hands crops to a pool of inference processes (one per worker).
+    With Config.CASCADE the backend has DeepFace re-score crops the custom
+    model is unsure about; each face's smoothed label is passed along so a
+    disagreeing prediction also counts as unsure. Crops that barely changed
+    since their face was last scored reuse that result (EmotionCache).
+    """
+    def __init__(self, num_workers=Config.ANALYSIS_WORKERS, backend=Config.ANALYSIS_BACKEND):
         self.deepface_model = "liveness" # DeepFace handles its own models
-        self.custom_model = None
-        self.load_custom_model()
+        self.num_workers = max(1, num_workers)
+        self.backend = create_backend(backend, num_workers=self.num_workers)
+        self.cache = EmotionCache() if Config.EMOTION_CACHE else None
         
         self.current_emotion = "neutral"
         self.emotion_probs = {e: 0.0 for e in Config.EMOTIONS}
@@ -21,108 +40,194 @@ class EmotionAnalyzer:
         self.frame_count = 0
         self.last_deepface_time = 0
         self.deepface_interval = 0.21 # seconds
-        self._worker_running = False
-        self.smoothed_probs = {e: 0.0 for e in Config.EMOTIONS}
+        self.mailbox = DropOldestQueue(maxsize=1)
+        self.workers = []
+        self.cadence_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.processed = 0
         self.smoothing_alpha = 0.25  # lower = smoother
-        self.label_hold_frames = 0
-        self.last_stable_emotion = "neutral"
+        self.face_results = {} # key -> (emotion, probs)
+        self.result_frame = None     # index of the frame the latest result came from
+        self.result_captured = None  # capture timestamp (perf_counter) of that frame
+        self.max_age = 0.0           # skip batches older than this (seconds, 0 = never)
+        self.stale = 0
+        self.escalated = 0
         self.label_stability_threshold = 3  # number of consistent wins before switching
+        # EMA + hysteresis state of every face, one array row per key
+        self.stabilizer = Stabilizer(alpha=self.smoothing_alpha, hold=self.label_stability_threshold)
+        self.profiler = None  # optional StageProfiler for worker timings
 
 
-    def load_custom_model(self):
-        try:
-            if os.path.exists(Config.MODEL_PATH):
-                self.custom_model = load_model(Config.MODEL_PATH, compile=False)
-                print("✅ Custom FER Model Loaded.")
-            else:
-                print(f"⚠️ Custom model not found at {Config.MODEL_PATH}. Using DeepFace only.")
-        except Exception as e:
-            print(f"❌ Error loading custom model: {e}")
-
     def start(self):
         self.running = True
+        if not self.workers:
+            for i in range(self.num_workers):
+                t = threading.Thread(target=self._worker, name=f"analyzer-{i}", daemon=True)
+                t.start()
+                self.workers.append(t)
         
+    def warm_up(self):
+        """Runs a dummy prediction on the backend (call before the first frame)."""
+        self.backend.warm_up()
+
     def stop(self):
         self.running = False
-
-    def analyze(self, face_img):
-        if not self.running:
+        self.mailbox.close()
+        for t in self.workers:
+            t.join(timeout=1.0)
+        self.workers = []
+        self.backend.close()
+
+    def analyze(self, face_imgs, keys=None, captured=None, frame_index=None):
+        """
+        Queues the face crops of one frame. Accepts a single crop or a list;
+        keys (default: 0..N-1) identify the faces across frames. captured and
+        frame_index identify the source frame and travel with the result.
+        """
+        if not self.running or face_imgs is None:
+            return
+        if not isinstance(face_imgs, (list, tuple)):
+            face_imgs = [face_imgs]
+        if keys is None:
+            keys = list(range(len(face_imgs)))
+
+        # Crops are views into a frame later stages draw on
+        batch = [(k, f.copy()) for k, f in zip(keys, face_imgs) if f is not None and f.size > 0]
+        batch = batch[:Config.MAX_FACES]
+        if not batch:
             return
 
-        if hasattr(self, "_worker_running") and self._worker_running:
-            return  # skip if previous analysis still running
-
-        self._worker_running = True
-        threading.Thread(target=self._analyze_thread, args=(face_img,), daemon=True).start()
+        evicted = self.mailbox.put((batch, time.perf_counter(), captured, frame_index))
+        with self.lock:
+            self.submitted += len(batch)
+            if evicted is not None:
+                self.dropped += len(evicted[0])
+
+    def _next_slot(self):
+        """Reserves the next inference slot and returns seconds to wait for it."""
+        with self.cadence_lock:
+            now = time.time()
+            start = max(now, self.last_deepface_time + self.deepface_interval)
+            self.last_deepface_time = start
+            return start - now
+
+    def _worker(self):
+        while self.running:
+            try:
+                item = self.mailbox.get(timeout=0.1)
+            except Empty:
+                continue
+
+            wait = self._next_slot()
+            if wait > 0:
+                time.sleep(wait)
+                # A newer crop may have arrived while waiting for the slot
+                try:
+                    newer = self.mailbox.get_nowait()
+                    with self.lock:
+                        self.dropped += len(item[0])
+                    item = newer
+                except Empty:
+                    pass
+
+            captured = item[2]
+            if self.max_age and captured is not None and time.perf_counter() - captured > self.max_age:
+                with self.lock:
+                    self.stale += len(item[0])
+                continue
 
+            self._process(*item)
 
-    def _analyze_thread(self, face_img):
-        now = time.time()
-        if now - self.last_deepface_time < self.deepface_interval:
-            self._worker_running = False
-            return
-        self.last_deepface_time = now
+    def get_stats(self):
+        """
+        Crops submitted, dropped before inference, skipped as stale, processed,
+        and escalated to DeepFace by the cascade (count and share of processed).
+        """
+        with self.lock:
+            rate = self.escalated / self.processed if self.processed else 0.0
+            return {"submitted": self.submitted, "dropped": self.dropped, "stale": self.stale,
+                    "processed": self.processed, "escalated": self.escalated,
+                    "escalation_rate": round(rate, 3),
+                    "cache": self.cache.stats() if self.cache else None}
 
-        if face_img is None or face_img.size == 0:
-            self._worker_running = False
-            return
+    def _process(self, batch, submitted=None, captured=None, frame_index=None):
+        started = time.perf_counter()
+        if self.profiler and submitted is not None:
+            self.profiler.record("analyzer.wait", started - submitted)
 
         try:
-            custom_probs = {}
-            if self.custom_model:
-                roi = cv2.resize(face_img, (48, 48))
-                roi = roi.astype("float") / 255.0
-                roi = img_to_array(roi)
-                roi = np.expand_dims(roi, axis=0)
-
-                preds = self.custom_model.predict(roi, verbose=0)[0]
-                custom_probs = {label: float(prob) for label, prob in zip(Config.EMOTIONS, preds)}
+            keys = [k for k, _ in batch]
+            results, escalated = self._predict(batch)
 
-            final_probs = custom_probs
+            with self.lock:
+                self.escalated += sum(escalated)
+                now = time.time()
+                scored = [(k, p) for k, p in zip(keys, results) if p]
+                if scored:
+                    self._update_faces([k for k, _ in scored], [p for _, p in scored], now)
 
-            if not final_probs:
-                try:
-                    result = DeepFace.analyze(face_img, actions=['emotion'], enforce_detection=False, silent=True)
-                    if result and isinstance(result, list) and len(result) > 0:
-                        emotion_data = result[0].get('emotion', {})
-                        final_probs = {k.lower(): float(v)/100.0 for k, v in emotion_data.items()}
-                        final_probs.pop('disgust', None)
-                except Exception as e:
-                    print(f"DeepFace analysis error: {e}")
-
-            if final_probs:
-                with self.lock:
-                    # Initialize smoothed probs on first run
-                    if not any(self.smoothed_probs.values()):
-                        self.smoothed_probs = final_probs.copy()
-                    else:
-                        for k in self.smoothed_probs:
-                            self.smoothed_probs[k] = (
-                                self.smoothing_alpha * final_probs.get(k, 0.0)
-                                + (1 - self.smoothing_alpha) * self.smoothed_probs[k]
-                            )
-
-                    self.emotion_probs = self.smoothed_probs.copy()
-                    new_emotion = max(self.emotion_probs, key=self.emotion_probs.get)
-
-                    if new_emotion != self.last_stable_emotion:
-                        self.label_hold_frames += 1
-                        if self.label_hold_frames >= self.label_stability_threshold:
-                            self.last_stable_emotion = new_emotion
-                            self.label_hold_frames = 0
-                    else:
-                        self.label_hold_frames = 0
-
-                    self.current_emotion = self.last_stable_emotion
+                # Forget faces that left the frame
+                for key in self.stabilizer.forget(now - Config.FACE_STATE_TTL):
+                    self.face_results.pop(key, None)
 
+                if keys[0] in self.face_results:
+                    self.result_frame = frame_index
+                    self.result_captured = captured
+                    self.current_emotion, self.emotion_probs = self.face_results[keys[0]]
 
         except Exception as e:
             print(f"Analysis Error: {e}")
 
         finally:
-            self._worker_running = False
-
+            if self.profiler:
+                self.profiler.record("analyzer.infer", time.perf_counter() - started)
+            with self.lock:
+                self.processed += len(batch)
+
+    def _predict(self, batch):
+        """
+        Returns (results, escalated) for a batch, answering unchanged crops
+        from the cache and sending only the rest to the backend.
+        """
+        results = [None] * len(batch)
+        escalated = [False] * len(batch)
+        fingerprints = [None] * len(batch)
+        if self.cache:
+            for i, (key, crop) in enumerate(batch):
+                fingerprints[i] = self.cache.fingerprint(crop)
+                results[i] = self.cache.lookup(key, fingerprints[i])
+
+        todo = [i for i, probs in enumerate(results) if probs is None]
+        if todo:
+            with self.lock:
+                expected = [self.stabilizer.stable_label(batch[i][0]) for i in todo]
+            fresh, flags = self.backend.predict_batch([batch[i][1] for i in todo], expected)
+            for i, probs, flag in zip(todo, fresh, flags):
+                results[i] = probs
+                escalated[i] = flag
+                if self.cache and probs:
+                    self.cache.store(batch[i][0], fingerprints[i], probs)
+        return results, escalated
+
+    def _update_faces(self, keys, probs_list, now):
+        """EMA smoothing plus label hysteresis for a batch of faces. Caller holds the lock."""
+        self.stabilizer.update(keys, self.stabilizer.to_array(probs_list), now)
+        for key in keys:
+            self.face_results[key] = self.stabilizer.result(key)
 
     def get_results(self):
         with self.lock:
             return self.current_emotion, self.emotion_probs
+
+    def get_result_info(self):
+        """Which frame the current result came from and how old it is (seconds)."""
+        with self.lock:
+            captured = self.result_captured
+            age = time.perf_counter() - captured if captured is not None else None
+            return {"frame": self.result_frame, "captured": captured, "age": age}
+
+    def get_face_results(self):
+        """Returns {key: (emotion, probs)} for every face currently tracked."""
+        with self.lock:
+            return dict(self.face_results)
@@ -0,0 +1,119 @@
+"""
+Lazy, size-keyed background image cache with an LRU memory cap
+"""
+import os
+import cv2
+import threading
+import numpy as np
+from collections import OrderedDict
+from src.config import Config
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class BackgroundCache:
+    """
+    Serves background images already resized to the output frame.
+
+    Images are only decoded the first time an emotion is shown. Decoded
+    sources and resized copies (keyed by emotion, output size and dtype)
+    share one memory budget of max_bytes; the least recently used entries
+    are evicted first.
+
+    Each directory may hold <emotion>.<ext> files and/or <emotion>/ folders
+    with any number of images. Earlier directories take precedence. Folder
+    packs rotate to their next image on next_variant().
+    """
+    def __init__(self, directories, max_bytes=Config.BACKGROUND_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sources = self._index(directories)
+        self.variant = {emotion: 0 for emotion in self.sources}
+
+    def _index(self, directories):
+        """Maps emotion -> list of image paths without decoding anything."""
+        sources = {}
+        for directory in directories:
+            if not directory or not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                stem, ext = os.path.splitext(name)
+                emotion = stem.lower()
+                if emotion in sources:
+                    continue
+                if os.path.isdir(path):
+                    images = sorted(
+                        os.path.join(path, f) for f in os.listdir(path)
+                        if f.lower().endswith(IMAGE_EXTENSIONS)
+                    )
+                    if images:
+                        sources[emotion] = images
+                elif ext.lower() in IMAGE_EXTENSIONS:
+                    sources[emotion] = [path]
+        return sources
+
+    def available(self, emotion):
+        return emotion in self.sources
+
+    def next_variant(self, emotion):
+        """Switches an emotion with several images to the next one."""
+        paths = self.sources.get(emotion)
+        if paths and len(paths) > 1:
+            with self.lock:
+                self.variant[emotion] = (self.variant[emotion] + 1) % len(paths)
+
+    def get(self, emotion, size, dtype=np.uint8):
+        """
+        Returns the background for emotion resized to size=(width, height),
+        or None if there is none or it failed to load. Callers must not
+        modify the returned array.
+        """
+        paths = self.sources.get(emotion)
+        if not paths:
+            return None
+        path = paths[self.variant[emotion]]
+        key = (emotion, path, tuple(size), np.dtype(dtype).str)
+
+        with self.lock:
+            image = self._lookup(key)
+            if image is not None:
+                self.hits += 1
+                return image
+            self.misses += 1
+
+            source = self._lookup(("source", path))
+            if source is None:
+                source = cv2.imread(path)
+                if source is None:
+                    print(f"⚠️ Background image for '{emotion}' failed to load: {path}")
+                    return None
+                self._store(("source", path), source)
+
+            image = cv2.resize(source, tuple(size)).astype(dtype, copy=False)
+            image.setflags(write=False)
+            self._store(key, image)
+            return image
+
+    def _lookup(self, key):
+        image = self.entries.get(key)
+        if image is not None:
+            self.entries.move_to_end(key)
+        return image
+
+    def _store(self, key, image):
+        self.entries[key] = image
+        self.used_bytes += image.nbytes
+        # Evict least recently used entries, but always keep the newest one
+        while self.used_bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.used_bytes -= old.nbytes
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.used_bytes,
+                    "hits": self.hits, "misses": self.misses}
@@ -1,97 +1,281 @@
 import os
 import cv2
 import numpy as np
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
-from collections import deque
+from src.config import Config
+from src.core.background_cache import BackgroundCache
+from src.core.compositor import Compositor
+from src.core.frame import Frame
+from src.core.motion_gate import MotionGate
+from src.core.segmentation_worker import SegmentationWorker
+from src.core.stabilizer import Stabilizer
 
-class BackgroundGenerator:
-    def __init__(self):
-        self.CONF_THRESHOLD = 0.7
-        self.emotion_history = deque(maxlen=15)
-        self.current_background = "neutral"
+BASE_DIR = os.path.dirname(__file__)
+MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "models", "selfie_segmenter.tflite"))
 
-        BASE_DIR = os.path.dirname(__file__)
-        BG_DIR = os.path.abspath(os.path.join(BASE_DIR, "..","..","backgrounds"))
-        BASE_DIR = os.path.dirname(__file__)
-        MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "models", "selfie_segmenter.tflite"))
-
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Segmentation model not found: {MODEL_PATH}")
-
-        # Load backgrounds
-        self.backgrounds = {
-            "happy": cv2.imread(os.path.join(BG_DIR, "happy.jpeg")),
-            "sad": cv2.imread(os.path.join(BG_DIR, "sad.jpeg")),
-            "angry": cv2.imread(os.path.join(BG_DIR, "angry.jpeg")),
-            "neutral": cv2.imread(os.path.join(BG_DIR, "neutral.jpeg")),
-            "fear" :  cv2.imread(os.path.join(BG_DIR, "fear.jpeg")),
-            "surprise" :  cv2.imread(os.path.join(BG_DIR, "surprise.jpeg"))
-        }
-
-        for k, v in self.backgrounds.items():
-            if v is None:
-                print(f"⚠️ Background image for '{k}' failed to load.")
-
-        # Initialize Image Segmenter (Tasks API)
-        base_options = python.BaseOptions(model_asset_path=MODEL_PATH)
+
+class PersonSegmenter:
+    """
+    MediaPipe selfie segmenter that turns a (downscaled) frame into a uint8
+    background alpha mask of the same size, 255 = background.
+
+    With soft_mask the alpha comes from the model's confidence, otherwise
+    from the category mask (0/255). Confidence outside the soft_low..soft_high
+    band is snapped to 0/255, so the mask is only soft along the person's
+    edge and the compositor's foreground box stays tight. edge_refine (odd kernel size, 0 = off)
+    feathers the mask. Used in-process by BackgroundGenerator and inside
+    the segmentation worker process.
+    """
+    def __init__(self, soft_mask=Config.SEGMENTATION_SOFT_MASK, edge_refine=Config.SEGMENTATION_EDGE_REFINE,
+                 model_path=MODEL_PATH):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Segmentation model not found: {model_path}")
+        self.soft_mask = soft_mask
+        self.soft_low = Config.SEGMENTATION_SOFT_LOW
+        self.soft_high = Config.SEGMENTATION_SOFT_HIGH
+        self.edge_refine = edge_refine
+        self.conf_is_background = None
+
+        # Initialize Image Segmenter (Tasks API); MediaPipe is only imported here
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+        base_options = python.BaseOptions(model_asset_path=model_path)
         options = vision.ImageSegmenterOptions(
             base_options=base_options,
             running_mode=vision.RunningMode.VIDEO,
-            output_category_mask=True
+            output_category_mask=True,
+            output_confidence_masks=soft_mask
         )
         self.segmenter = vision.ImageSegmenter.create_from_options(options)
-
         self.video_ts = 0
 
+    def segment(self, frame):
+        """Returns the alpha mask for a Frame at its own size, or None."""
+        # Run segmentation
+        self.video_ts += 1
+        result = self.segmenter.segment_for_video(frame.mp_image, self.video_ts)
+
+        mask = result.category_mask
+        if mask is None:
+            return None
+
+        # 🔥 Normalize mask shape to (H, W)
+        mask_np = np.squeeze(mask.numpy_view())
+
+        if mask_np.ndim != 2:
+            raise ValueError(f"Unexpected mask shape after squeeze: {mask_np.shape}")
+
+        # Binary mask
+        condition = mask_np > 0.65
+        if self.soft_mask and result.confidence_masks:
+            alpha = self._soft_alpha(condition, result.confidence_masks[0].numpy_view())
+        else:
+            alpha = condition.astype(np.uint8) * 255
+
+        if self.edge_refine:
+            alpha = cv2.GaussianBlur(alpha, (self.edge_refine, self.edge_refine), 0)
+        return alpha
+
+    def _soft_alpha(self, condition, confidence):
+        """
+        Converts the model's confidence mask to background alpha. Whether
+        the confidence is for the person or the background is read off the
+        category mask the first time both classes are present.
+        """
+        confidence = np.squeeze(confidence)
+        if self.conf_is_background is None:
+            if not condition.any() or condition.all():
+                return condition.astype(np.uint8) * 255
+            self.conf_is_background = bool(confidence[condition].mean() > confidence[~condition].mean())
+        alpha = confidence if self.conf_is_background else 1.0 - confidence
+        alpha = np.clip(alpha, self.soft_low, self.soft_high) - self.soft_low
+        return cv2.convertScaleAbs(alpha, alpha=255.0 / (self.soft_high - self.soft_low))
+
+
+class BackgroundGenerator:
+    """
+    Replaces the background with an image matching the stable emotion.
+
+    Segmentation runs on a copy of the frame downscaled to seg_width pixels
+    wide (0 = full resolution); the mask is upsampled back to the frame size.
+    edge_refine (odd kernel size, 0 = off) feathers the low-res mask before
+    upsampling so the upscaled edge is smooth rather than blocky.
+
+    Masks are uint8 alpha (255 = background). With soft_mask they come from
+    the segmenter's confidence and keep their soft edge, otherwise they are
+    thresholded to 0/255. The Compositor blends in place into the frame.
+
+    With use_process the segmenter runs in a SegmentationWorker process:
+    frames are handed over without waiting and each frame is composited
+    with the newest mask available, so segmentation runs at its own pace.
+
+    With segment_every > 1 the segmenter only runs on every Nth frame and
+    the last mask is reused in between. With motion gating the last mask is
+    also reused while the scene stays still; either way a mask is never
+    reused for more than max_mask_age frames.
+
+    Backgrounds come from a BackgroundCache: extra directories (e.g. large
+    user packs) are searched before the bundled backgrounds/ folder.
+    """
+    def __init__(self, seg_width=Config.SEGMENTATION_WIDTH, edge_refine=Config.SEGMENTATION_EDGE_REFINE,
+                 background_dirs=Config.BACKGROUND_DIRS, motion_gate=Config.MOTION_GATE,
+                 max_mask_age=Config.MAX_MASK_AGE, soft_mask=Config.SEGMENTATION_SOFT_MASK,
+                 use_process=Config.SEGMENTATION_PROCESS):
+        self.CONF_THRESHOLD = 0.7
+        self.seg_width = seg_width
+        self.soft_mask = soft_mask
+        self.compositor = Compositor()
+        self.segment_every = 1
+        self.motion_gate = MotionGate() if motion_gate else None
+        self.max_mask_age = max_mask_age
+        self.last_mask = None
+        self.mask_frame = 0
+        self.frames_seen = 0
+        self.segment_calls = 0
+        self.masks_reused = 0
+        # Confident top emotions of the last 15 frames; the majority picks the background
+        self.emotion_votes = Stabilizer(window=15)
+        self.current_background = "neutral"
+
+        BASE_DIR = os.path.dirname(__file__)
+        BG_DIR = os.path.abspath(os.path.join(BASE_DIR, "..","..","backgrounds"))
+
+        # Index backgrounds (decoded lazily on first use)
+        self.backgrounds = BackgroundCache(list(background_dirs) + [BG_DIR])
+
+        for k in Config.EMOTIONS:
+            if not self.backgrounds.available(k):
+                print(f"⚠️ Background image for '{k}' not found.")
+
+        # The segmenter runs here, or in a worker process that owns its own copy
+        if use_process:
+            self.segmenter = None
+            self.worker = SegmentationWorker(soft_mask=soft_mask, edge_refine=edge_refine)
+        else:
+            self.segmenter = PersonSegmenter(soft_mask=soft_mask, edge_refine=edge_refine)
+            self.worker = None
+        self.mask_seq = -1
+
+    def warm_up(self, width=Config.CAMERA_WIDTH, height=Config.CAMERA_HEIGHT):
+        """Segments one blank frame so the first live frame does not pay model setup."""
+        if self.worker:
+            # Frames are at most width x height; the worker loads its model before ready
+            if self.worker.start(width, height, wait=True):
+                self.mask_seq = -1
+            return
+        self._run_segmenter(Frame(np.zeros((height, width, 3), dtype=np.uint8)))
+
     def apply(self, frame, probs):
+        """Composites frame (Frame or BGR array) and returns the BGR result."""
+        if not isinstance(frame, Frame):
+            frame = Frame(frame)
         if probs is None or not probs:
-            return frame
+            return frame.bgr
 
         # Stability logic for background switching
         top_emotion = max(probs, key=probs.get)
-        if probs[top_emotion] > self.CONF_THRESHOLD:
-            self.emotion_history.append(top_emotion)
+        if probs[top_emotion] > self.CONF_THRESHOLD and top_emotion in self.emotion_votes.index:
+            self.emotion_votes.vote(["scene"], [self.emotion_votes.index[top_emotion]])
 
-        if len(self.emotion_history) == self.emotion_history.maxlen:
-            stable_emotion = max(set(self.emotion_history), key=self.emotion_history.count)
+        stable_emotion = self.emotion_votes.majority("scene")
+        if stable_emotion is not None:
+            if stable_emotion != self.current_background:
+                self.backgrounds.next_variant(stable_emotion)
             self.current_background = stable_emotion
 
-        bg_image = self.backgrounds.get(self.current_background)
-        if bg_image is None:
-            return frame
+        bg_resized = self.backgrounds.get(self.current_background, (frame.width, frame.height), frame.bgr.dtype)
+        if bg_resized is None:
+            return frame.bgr
 
-        # Run segmentation
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+        alpha = self.segment(frame)
+        if alpha is None:
+            return frame.bgr
 
-        self.video_ts += 1
-        result = self.segmenter.segment_for_video(mp_image, self.video_ts)
+        if frame.bgr.flags.writeable:
+            output = self.compositor.blend(frame.bgr, bg_resized, alpha)
+            # Views derived from the old pixels are stale now
+            frame.invalidate()
+        else:
+            output = self.compositor.blend(frame.bgr, bg_resized, alpha, out=np.empty_like(frame.bgr))
+        return output
 
-        mask = result.category_mask
-        if mask is None:
-            return frame
+    def segment(self, frame):
+        """
+        Returns a (H, W) uint8 alpha mask, 255 where the background should
+        be replaced, or None if the segmenter produced no mask.
+        """
+        if not isinstance(frame, Frame):
+            frame = Frame(frame)
+        h, w = frame.height, frame.width
 
-        mask_np = mask.numpy_view()
+        self.frames_seen += 1
+        if self.worker:
+            return self._segment_async(frame, h, w)
+        if self._can_reuse(frame, h, w):
+            self.masks_reused += 1
+            return self.last_mask
 
-        # 🔥 Normalize mask shape to (H, W)
-        mask_np = np.squeeze(mask_np)
+        self.last_mask = self._run_segmenter(frame)
+        self.mask_frame = self.frames_seen
+        self.segment_calls += 1
+        if self.motion_gate:
+            self.motion_gate.reset(frame)
+        return self.last_mask
 
-        if mask_np.ndim != 2:
-            raise ValueError(f"Unexpected mask shape after squeeze: {mask_np.shape}")
+    def _can_reuse(self, frame, h, w):
+        if self.last_mask is None or self.last_mask.shape != (h, w):
+            return False
+        if self.frames_seen - self.mask_frame >= self.max_mask_age:
+            return False
+        if self.segment_every > 1 and self.frames_seen % self.segment_every:
+            return True
+        return self.motion_gate is not None and not self.motion_gate.moved(frame)
 
-        # Binary mask
-        condition = mask_np > 0.65
+    def _segment_async(self, frame, h, w):
+        """Hands frame to the worker when a new mask is due; returns the newest mask."""
+        if self.worker.start(w, h):
+            # A new process numbers its masks from scratch
+            self.mask_seq = -1
+            self.last_mask = None
+        if self._can_reuse(frame, h, w):
+            self.masks_reused += 1
+        elif self.worker.submit(frame.scaled(self.seg_width)):
+            self.mask_frame = self.frames_seen
+            self.segment_calls += 1
+            if self.motion_gate:
+                self.motion_gate.reset(frame)
 
-        # Expand to (H, W, 1) for RGB broadcasting
-        condition = condition[..., None]
+        newest = self.worker.latest(self.mask_seq)
+        if newest is not None:
+            self.mask_seq, alpha = newest
+            self.last_mask = self._upsample(alpha, h, w)
+        if self.last_mask is not None and self.last_mask.shape != (h, w):
+            return None
+        return self.last_mask
 
-        bg_resized = cv2.resize(bg_image, (frame.shape[1], frame.shape[0]))
+    def stats(self):
+        stats = {"segment_calls": self.segment_calls, "masks_reused": self.masks_reused}
+        if self.worker:
+            stats["worker"] = self.worker.stats()
+        return stats
 
-        output = np.where(condition, bg_resized, frame)
+    def close(self):
+        if self.worker:
+            self.worker.stop()
+
+    def _run_segmenter(self, frame):
+        alpha = self.segmenter.segment(frame.scaled(self.seg_width))
+        if alpha is None:
+            return None
+        return self._upsample(alpha, frame.height, frame.width)
+
+    def _upsample(self, alpha, h, w):
+        if alpha.shape != (h, w):
+            alpha = cv2.resize(alpha, (w, h), interpolation=cv2.INTER_LINEAR)
+        if not self.soft_mask:
+            # Threshold the feathered/upsampled mask again for a hard edge
+            alpha = cv2.threshold(alpha, 127, 255, cv2.THRESH_BINARY)[1]
+        return alpha
 
-        return output
     def get_current_background(self):
         return self.current_background
 
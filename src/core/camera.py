@@ -1,36 +1,250 @@
+import os
+import sys
 import cv2
 import threading
 import time
+from src.config import Config
+from src.core.frame import Frame
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
 
 class VideoStream:
-    def __init__(self, src=0, width=1280, height=720):
+    """
+    Captures a live camera on a background thread into a ring of
+    preallocated frame buffers.
+
+    read() hands out the newest captured buffer as a read-only Frame
+    carrying its sequence number and capture timestamp, without copying.
+    The slot stays reserved until the caller calls frame.release(), so
+    release as soon as the frame has been converted (e.g. flipped).
+
+    frames_dropped counts captures that were overwritten before anyone read
+    them; frames_duplicated counts reads that returned a frame already seen
+    because no newer one arrived in time.
+    """
+    def __init__(self, src=0, width=1280, height=720, num_buffers=Config.CAPTURE_BUFFERS):
         self.src = src
-        self.cap = cv2.VideoCapture(self.src, cv2.CAP_DSHOW)
+        # DirectShow only exists on Windows; let OpenCV pick elsewhere
+        backend = cv2.CAP_DSHOW if sys.platform == "win32" else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(self.src, backend)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
         self.cap.set(cv2.CAP_PROP_FPS, 60)
-        
-        self.grabbed, self.frame = self.cap.read()
+
+        self.cond = threading.Condition()
         self.stopped = False
-        self.lock = threading.Lock()
-        
+        self.buffers = []
+        self.seqs = []       # sequence number held by each slot (-1 = empty)
+        self.stamps = []     # capture time (perf_counter) of each slot
+        self.borrowed = []   # outstanding read() references per slot
+        self.latest = -1     # slot holding the newest frame
+        self.seq = 0
+        self.last_read_seq = -1
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+
+        self.grabbed, frame = self.cap.read()
+        if self.grabbed:
+            self.buffers = [frame] + [frame.copy() for _ in range(max(2, num_buffers) - 1)]
+            self.seqs = [-1] * len(self.buffers)
+            self.stamps = [0.0] * len(self.buffers)
+            self.borrowed = [0] * len(self.buffers)
+            self._publish(0, time.perf_counter())
+
     def start(self):
         threading.Thread(target=self.update, args=(), daemon=True).start()
         return self
 
+    def _publish(self, slot, stamp):
+        """Marks slot as the newest frame. Caller holds cond (or is __init__)."""
+        if self.latest >= 0 and self.seqs[self.latest] > self.last_read_seq:
+            self.frames_dropped += 1
+        self.seqs[slot] = self.seq
+        self.stamps[slot] = stamp
+        self.seq += 1
+        self.latest = slot
+        self.frames_captured += 1
+
+    def _free_slot(self):
+        """A slot that is neither borrowed nor the newest frame, or None."""
+        for i in range(len(self.buffers)):
+            if i != self.latest and not self.borrowed[i]:
+                return i
+        return None
+
     def update(self):
-        while not self.stopped:
-            grabbed, frame = self.cap.read()
-            with self.lock:
+        while not self.stopped and self.buffers:
+            with self.cond:
+                self.cond.wait_for(lambda: self.stopped or self._free_slot() is not None)
+                if self.stopped:
+                    break
+                slot = self._free_slot()
+                self.seqs[slot] = -1
+
+            # Decode straight into the slot; OpenCV reuses it if the size matches
+            grabbed, frame = self.cap.read(self.buffers[slot])
+            stamp = time.perf_counter()
+
+            with self.cond:
                 self.grabbed = grabbed
-                self.frame = frame
-            if not grabbed:
-                self.stop()
+                if not grabbed:
+                    self.stopped = True
+                    self.cond.notify_all()
+                    break
+                self.buffers[slot] = frame
+                self._publish(slot, stamp)
+                self.cond.notify_all()
+
+        self.cap.release()
+
+    def read(self, timeout=1.0):
+        """
+        Returns the newest frame not read before, waiting up to timeout for
+        one. Returns the previous frame again on timeout and None once the
+        stream has ended.
+        """
+        with self.cond:
+            if not self.buffers:
+                return None
+            self.cond.wait_for(
+                lambda: self.stopped or self.seqs[self.latest] > self.last_read_seq, timeout
+            )
+            slot = self.latest
+            seq = self.seqs[slot]
+            if seq <= self.last_read_seq:
+                if self.stopped:
+                    return None
+                self.frames_duplicated += 1
+            self.last_read_seq = seq
+            self.borrowed[slot] += 1
+
+        view = self.buffers[slot].view()
+        view.setflags(write=False)
+        return Frame(view, index=seq, timestamp=self.stamps[slot],
+                     release=lambda: self._release(slot))
+
+    def _release(self, slot):
+        with self.cond:
+            self.borrowed[slot] -= 1
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {"captured": self.frames_captured, "dropped": self.frames_dropped,
+                    "duplicated": self.frames_duplicated}
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+
+class FileStream:
+    """
+    Replays a video file or a directory of images with the VideoStream interface.
+
+    read() returns Frame objects like VideoStream (release() is a no-op
+    here). By default every frame is returned in order, as fast as the
+    caller asks for them. With realtime=True frames are paced to their original
+    timestamps and frames the caller is too slow for are skipped, the way a
+    live camera behaves.
+    """
+    def __init__(self, src, realtime=False, fps=None):
+        self.src = src
+        self.realtime = realtime
+        self.cap = None
+        self.paths = None
+
+        if os.path.isdir(src):
+            self.paths = sorted(
+                os.path.join(src, name) for name in os.listdir(src)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not self.paths:
+                raise FileNotFoundError(f"No images found in {src}")
+            self.fps = fps or 30.0
+        else:
+            if not os.path.exists(src):
+                raise FileNotFoundError(f"Video source not found: {src}")
+            self.cap = cv2.VideoCapture(src)
+            if not self.cap.isOpened():
+                raise IOError(f"Could not open video: {src}")
+            self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.index = -1
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.stopped = False
+        self._t0 = None
+
+    def start(self):
+        return self
+
+    def _advance(self):
+        """Moves to the next frame without decoding it, returns its timestamp."""
+        if self.stopped:
+            return None
+        if self.cap is not None:
+            if not self.cap.grab():
+                return None
+            self.index += 1
+            # Container timestamps keep variable-frame-rate files in time
+            pos = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if pos > 0 or self.index == 0:
+                return pos / 1000.0
+            return self.index / self.fps  # backend reports no timestamps
+        if self.index + 1 >= len(self.paths):
+            return None
+        # Image directories have no timestamps; space them at fps
+        self.index += 1
+        return self.index / self.fps
+
+    def _retrieve(self):
+        if self.cap is not None:
+            ok, frame = self.cap.retrieve()
+            return frame if ok else None
+        return cv2.imread(self.paths[self.index])
 
     def read(self):
-        with self.lock:
-            return self.frame.copy() if self.frame is not None else None
+        ts = self._advance()
+        if ts is None:
+            return None
+
+        if self.realtime:
+            now = time.perf_counter()
+            if self._t0 is None:
+                self._t0 = now - ts
+            # Skip frames whose display slot has already passed
+            while ts + 1.0 / self.fps < now - self._t0:
+                ts = self._advance()
+                if ts is None:
+                    return None
+                self.frames_skipped += 1
+            delay = ts - (time.perf_counter() - self._t0)
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = self._retrieve()
+        if frame is None:
+            return None
+        self.frames_read += 1
+        return Frame(frame, index=self.index, timestamp=time.perf_counter())
+
+    def stats(self):
+        return {"captured": self.frames_read, "dropped": self.frames_skipped, "duplicated": 0}
 
     def stop(self):
         self.stopped = True
-        self.cap.release()
+        if self.cap is not None:
+            self.cap.release()
+
+
+def open_stream(src, width=1280, height=720, realtime=False):
+    """
+    Opens a live camera for integer sources and a FileStream for paths.
+    """
+    if isinstance(src, int) or str(src).isdigit():
+        return VideoStream(src=int(src), width=width, height=height)
+    return FileStream(src, realtime=realtime)
@@ -0,0 +1,44 @@
+"""
+Fixed-point alpha compositing of a background behind the foreground
+"""
+import cv2
+import numpy as np
+
+
+class Compositor:
+    """
+    Blends a background into a frame using a uint8 alpha mask
+    (255 = background, 0 = foreground, in between = soft edge).
+
+    out = fg * (255 - a) / 255 + bg * a / 255, with both products done by
+    cv2.multiply (saturating uint8, each term rounded, so the result is
+    within one gray level of the exact blend). Only the bounding box of the
+    foreground is blended; everything outside it is a plain copy of the
+    background.
+    """
+    def blend(self, frame, background, alpha, out=None):
+        """
+        Writes the composite into out (frame itself when out is None, so
+        frame must be writable) and returns it.
+        """
+        if out is None:
+            out = frame
+        # Foreground = any pixel not fully replaced by the background
+        x, y, w, h = cv2.boundingRect(cv2.compare(alpha, 255, cv2.CMP_LT))
+        if w == 0 or h == 0:
+            np.copyto(out, background)
+            return out
+
+        # Background outside the foreground box (top, bottom, left, right bands)
+        if out is not frame or y > 0 or y + h < out.shape[0] or x > 0 or x + w < out.shape[1]:
+            np.copyto(out[:y], background[:y])
+            np.copyto(out[y + h:], background[y + h:])
+            np.copyto(out[y:y + h, :x], background[y:y + h, :x])
+            np.copyto(out[y:y + h, x + w:], background[y:y + h, x + w:])
+
+        roi = (slice(y, y + h), slice(x, x + w))
+        a = cv2.merge((alpha[roi],) * 3)
+        fg = cv2.multiply(frame[roi], cv2.bitwise_not(a), scale=1 / 255)
+        bg = cv2.multiply(background[roi], a, scale=1 / 255)
+        np.copyto(out[roi], cv2.add(fg, bg))
+        return out
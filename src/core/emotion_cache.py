@@ -0,0 +1,66 @@
+"""
+Reuses emotion predictions for face crops that have not changed
+"""
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+from src.config import Config
+
+
+class EmotionCache:
+    """
+    Remembers the last prediction per face key together with a fingerprint
+    of the crop: a 48x48 grayscale thumbnail, the resolution the model sees.
+
+    lookup() returns the cached probabilities when the new crop's mean
+    absolute difference from that thumbnail is at most threshold gray
+    levels and the entry is younger than ttl seconds. The comparison is
+    against the crop that was actually scored, so slow drift still ends in
+    a fresh prediction. At most max_entries keys are kept (LRU).
+    """
+    def __init__(self, max_entries=Config.EMOTION_CACHE_SIZE, ttl=Config.EMOTION_CACHE_TTL,
+                 threshold=Config.EMOTION_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()  # key -> (fingerprint, probs, stored_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(crop):
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        return cv2.resize(gray, (48, 48), interpolation=cv2.INTER_AREA)
+
+    def lookup(self, key, fingerprint):
+        """Returns cached probs for key if the crop still matches, else None."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[2] <= self.ttl:
+                if cv2.absdiff(fingerprint, entry[0]).mean() <= self.threshold:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+            self.misses += 1
+            return None
+
+    def store(self, key, fingerprint, probs):
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (fingerprint, probs, now)
+            self.entries.move_to_end(key)
+            # Expired entries first, then least recently used
+            for k in [k for k, e in self.entries.items() if now - e[2] > self.ttl]:
+                del self.entries[k]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                    "hit_rate": round(self.hits / total, 3) if total else 0.0}
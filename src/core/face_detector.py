@@ -1,8 +1,45 @@
 """
-Simple face detector using OpenCV Haar Cascades as fallback
+Face detectors (MediaPipe BlazeFace, OpenCV Haar Cascades as fallback) and
+a front-end that runs them on downscaled frames and regions of interest
 """
 import cv2
 import os
+from src.config import Config
+from src.core.frame import Frame
+
+BASE_DIR = os.path.dirname(__file__)
+MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "models", "blaze_face_short_range.tflite"))
+
+
+class MediaPipeFaceDetector:
+    """
+    BlazeFace through the MediaPipe Tasks API. Raises ImportError when
+    MediaPipe is not installed. Runs in IMAGE mode because the front-end
+    feeds it crops of varying size rather than a video stream.
+    """
+    def __init__(self, model_path=MODEL_PATH):
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+
+        base_options = python.BaseOptions(model_asset_path=model_path)
+        options = vision.FaceDetectorOptions(
+            base_options=base_options,
+            running_mode=vision.RunningMode.IMAGE
+        )
+        self.detector = vision.FaceDetector.create_from_options(options)
+
+    def detect(self, frame):
+        """Returns (x, y, w, h) boxes for a Frame or BGR array."""
+        if not isinstance(frame, Frame):
+            frame = Frame(frame)
+        result = self.detector.detect(frame.mp_image)
+        boxes = []
+        if result.detections is not None:
+            for det in result.detections:
+                bbox = det.bounding_box
+                boxes.append((bbox.origin_x, bbox.origin_y, bbox.width, bbox.height))
+        return boxes
+
 
 class SimpleFaceDetector:
     def __init__(self):
@@ -12,14 +49,110 @@ class SimpleFaceDetector:
         
     def detect(self, frame):
         """
-        Detect faces in frame
+        Detect faces in frame (BGR array or Frame, whose cached gray view is reused)
         Returns list of face bounding boxes in format (x, y, w, h)
         """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if isinstance(frame, Frame):
+            gray = frame.gray
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         faces = self.face_cascade.detectMultiScale(
             gray,
             scaleFactor=1.1,
             minNeighbors=5,
             minSize=(30, 30)
         )
-        return faces
+        return [tuple(int(v) for v in f) for f in faces]
+
+
+def create_face_detector():
+    """MediaPipe if available, otherwise the Haar Cascade fallback."""
+    try:
+        detector = MediaPipeFaceDetector()
+        print("✅ MediaPipe FaceDetector initialized")
+        return detector
+    except ImportError:
+        print("⚠️  MediaPipe not available, using OpenCV Haar Cascade fallback")
+        return SimpleFaceDetector()
+
+
+def _merge(rects):
+    """Merges overlapping (x0, y0, x1, y1) rectangles into their unions."""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+class RoiFaceDetector:
+    """
+    Detection front-end shared by both detectors.
+
+    The detector sees the frame downscaled to `width` pixels (0 = full
+    resolution) and boxes are mapped back to full-resolution coordinates.
+    When faces are already known (e.g. tracker boxes) only regions around
+    them, grown by `margin` times the box size on each side, are searched.
+    Every `full_scan_every` runs the whole frame is scanned again so new
+    faces are picked up.
+    """
+    def __init__(self, detector, width=Config.DETECT_WIDTH, margin=Config.DETECT_ROI_MARGIN,
+                 full_scan_every=Config.DETECT_FULL_SCAN_EVERY):
+        self.detector = detector
+        self.width = width
+        self.margin = margin
+        self.full_scan_every = max(1, full_scan_every)
+        self.runs_since_full = None
+        self.full_scans = 0
+        self.roi_scans = 0
+
+    def detect(self, frame, known=None):
+        """Returns (x, y, w, h) boxes in frame coordinates."""
+        if not isinstance(frame, Frame):
+            frame = Frame(frame)
+        small = frame.scaled(self.width)
+        scale = frame.width / small.width
+
+        if (not known or self.runs_since_full is None
+                or self.runs_since_full + 1 >= self.full_scan_every):
+            self.runs_since_full = 0
+            self.full_scans += 1
+            return self._to_frame(self.detector.detect(small), scale, 0, 0)
+
+        self.runs_since_full += 1
+        self.roi_scans += 1
+        boxes = []
+        for x0, y0, x1, y1 in self._rois(known, scale, small.width, small.height):
+            crop = Frame(small.bgr[y0:y1, x0:x1])
+            boxes.extend(self._to_frame(self.detector.detect(crop), scale, x0, y0))
+        return boxes
+
+    def _rois(self, known, scale, w, h):
+        rects = []
+        for x, y, bw, bh in known:
+            mx, my = bw * self.margin, bh * self.margin
+            x0 = max(0, int((x - mx) / scale))
+            y0 = max(0, int((y - my) / scale))
+            x1 = min(w, int((x + bw + mx) / scale) + 1)
+            y1 = min(h, int((y + bh + my) / scale) + 1)
+            if x1 > x0 and y1 > y0:
+                rects.append((x0, y0, x1, y1))
+        return _merge(rects)
+
+    @staticmethod
+    def _to_frame(boxes, scale, ox, oy):
+        return [(int(round((x + ox) * scale)), int(round((y + oy) * scale)),
+                 int(round(w * scale)), int(round(h * scale))) for x, y, w, h in boxes]
+
+    def stats(self):
+        return {"full_scans": self.full_scans, "roi_scans": self.roi_scans}
@@ -0,0 +1,143 @@
+"""
+Lightweight face tracker so the detector only runs every few frames
+"""
+import numpy as np
+from src.config import Config
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = np.array(box, dtype=np.float32)
+        self.velocity = np.zeros(2, dtype=np.float32)  # center shift per frame
+        self.confidence = 1.0
+        self.missed = 0
+        self.frames_since_update = 0
+
+    def center(self):
+        x, y, w, h = self.box
+        return np.array([x + w / 2, y + h / 2], dtype=np.float32)
+
+    def as_int(self):
+        return tuple(int(round(v)) for v in self.box)
+
+
+class FaceTracker:
+    """
+    Keeps stable ids for faces between detector runs.
+
+    Detections are matched to tracks by IoU, falling back to centroid
+    distance for fast movers. Between detections boxes move with their
+    estimated velocity while confidence decays; the detector should run
+    again (needs_detection) every detect_interval frames or as soon as a
+    track's confidence drops below min_confidence.
+    """
+    def __init__(self, detect_interval=Config.DETECT_INTERVAL, iou_threshold=Config.TRACK_IOU_THRESHOLD,
+                 min_confidence=Config.TRACK_MIN_CONFIDENCE, max_missed=Config.TRACK_MAX_MISSED,
+                 decay=0.9):
+        self.detect_interval = max(1, detect_interval)
+        self.iou_threshold = iou_threshold
+        self.min_confidence = min_confidence
+        self.max_missed = max_missed
+        self.decay = decay
+        self.tracks = []
+        self.next_id = 0
+        self.frames_since_detect = None
+
+    def needs_detection(self):
+        if self.frames_since_detect is None or not self.tracks:
+            return True
+        if self.frames_since_detect + 1 >= self.detect_interval:
+            return True
+        return any(t.confidence < self.min_confidence for t in self.tracks)
+
+    def predict(self):
+        """Advances every track one frame without a detection."""
+        for t in self.tracks:
+            t.box[:2] += t.velocity
+            t.frames_since_update += 1
+            t.confidence *= self.decay
+        if self.frames_since_detect is not None:
+            self.frames_since_detect += 1
+        return self.active()
+
+    def update(self, boxes):
+        """Feeds detector output (x, y, w, h) boxes for the current frame."""
+        for t in self.tracks:
+            t.frames_since_update += 1
+            t.box[:2] += t.velocity
+
+        matches = self._associate(boxes)
+        matched_boxes = set()
+        for t in self.tracks:
+            i = matches.get(t.id)
+            if i is None:
+                t.missed += 1
+                t.confidence *= self.decay
+                continue
+            new_box = np.array(boxes[i], dtype=np.float32)
+            old_center = t.center() - t.velocity * t.frames_since_update
+            t.box = new_box
+            shift = (t.center() - old_center) / max(1, t.frames_since_update)
+            t.velocity = 0.5 * t.velocity + 0.5 * shift
+            t.confidence = 1.0
+            t.missed = 0
+            t.frames_since_update = 0
+            matched_boxes.add(i)
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        for i, box in enumerate(boxes):
+            if i not in matched_boxes:
+                self.tracks.append(Track(self.next_id, box))
+                self.next_id += 1
+
+        self.frames_since_detect = 0
+        return self.active()
+
+    def _associate(self, boxes):
+        """Greedy matching: highest IoU first, then nearest centroid."""
+        matches = {}
+        used = set()
+        pairs = []
+        for t in self.tracks:
+            for i, box in enumerate(boxes):
+                score = iou(t.box, box)
+                if score >= self.iou_threshold:
+                    pairs.append((score, t.id, i))
+        for _, tid, i in sorted(pairs, reverse=True):
+            if tid not in matches and i not in used:
+                matches[tid] = i
+                used.add(i)
+
+        for t in self.tracks:
+            if t.id in matches:
+                continue
+            c = t.center()
+            limit = 0.5 * max(t.box[2], t.box[3])
+            best, best_dist = None, limit
+            for i, (x, y, w, h) in enumerate(boxes):
+                if i in used:
+                    continue
+                dist = float(np.hypot(x + w / 2 - c[0], y + h / 2 - c[1]))
+                if dist < best_dist:
+                    best, best_dist = i, dist
+            if best is not None:
+                matches[t.id] = best
+                used.add(best)
+        return matches
+
+    def active(self):
+        """Returns [(track_id, (x, y, w, h))] ordered oldest track first."""
+        return [(t.id, t.as_int()) for t in sorted(self.tracks, key=lambda t: t.id)]
@@ -0,0 +1,99 @@
+"""
+Per-frame representation shared by all pipeline stages
+"""
+import cv2
+
+
+class Frame:
+    """
+    A BGR image plus lazily computed views of it (RGB, grayscale,
+    MediaPipe image, downscaled copies). Each view is computed at most once
+    per frame, so stages that need the same conversion share it.
+
+    Views are snapshots: call invalidate() after drawing into bgr in place
+    if later stages still need derived views.
+
+    Frames borrowed from a capture ring buffer must be given back with
+    release() once the pixels are no longer needed.
+
+    A frame processed below capture resolution can keep the full-resolution
+    capture as `source`, e.g. to cut sharper face crops from it.
+    """
+    def __init__(self, bgr, index=0, timestamp=None, release=None, source=None):
+        self.bgr = bgr
+        self.index = index
+        self.timestamp = timestamp
+        self.source = source
+        self._cache = {}
+        self._release = release
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def width(self):
+        return self.bgr.shape[1]
+
+    @property
+    def height(self):
+        return self.bgr.shape[0]
+
+    def _memo(self, key, compute):
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+
+    @property
+    def rgb(self):
+        return self._memo("rgb", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    @property
+    def gray(self):
+        return self._memo("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def mp_image(self):
+        def build():
+            import mediapipe as mp
+            return mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb)
+        return self._memo("mp_image", build)
+
+    def scaled(self, width):
+        """
+        Returns a Frame downscaled to the given width (aspect preserved), or
+        this frame if it is already that narrow or width is 0.
+        """
+        if not width or width >= self.width:
+            return self
+
+        def build():
+            height = max(1, round(self.height * width / self.width))
+            small = cv2.resize(self.bgr, (width, height), interpolation=cv2.INTER_AREA)
+            return Frame(small, self.index, self.timestamp)
+        return self._memo(("scaled", width), build)
+
+    def pyramid(self, level):
+        """Returns the frame halved level times (cv2.pyrDown), memoized per level."""
+        if level <= 0:
+            return self
+        return self._memo(
+            ("pyramid", level),
+            lambda: Frame(cv2.pyrDown(self.pyramid(level - 1).bgr), self.index, self.timestamp),
+        )
+
+    def replace(self, bgr):
+        """Returns a Frame for a new image of the same capture (e.g. after compositing)."""
+        if bgr is self.bgr:
+            return self
+        return Frame(bgr, self.index, self.timestamp, source=self.source)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def release(self):
+        """Returns a borrowed buffer to its owner. Safe to call more than once."""
+        release, self._release = self._release, None
+        if release is not None:
+            release()
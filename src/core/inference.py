@@ -0,0 +1,315 @@
+"""
+Emotion inference backends used by EmotionAnalyzer
+
+TensorFlow and DeepFace are imported on first use, so configurations that
+never need them (no custom model file, USE_DEEPFACE off) start without them.
+A converted TFLite model only needs the interpreter.
+"""
+import os
+import threading
+import cv2
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from queue import Queue
+from src.config import Config
+
+
+class TFLiteModel:
+    """
+    Runs a converted .tflite FER model (see scripts/convert_model.py) with
+    the same input_shape / predict() interface as the Keras model.
+
+    Uses the small tflite_runtime package when installed and falls back to
+    tf.lite. Quantized (int8) inputs and outputs are scaled transparently.
+    The interpreter is not thread-safe, so predict() calls are serialized.
+    """
+    def __init__(self, path, num_threads=Config.TFLITE_THREADS):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None,) + tuple(int(d) for d in self.input["shape"][1:])
+        self.batch_size = None
+        self.lock = threading.Lock()
+
+    def _resize(self, n):
+        if n != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input["index"], [n] + list(self.input_shape[1:]))
+            self.interpreter.allocate_tensors()
+            self.batch_size = n
+
+    def predict(self, batch, verbose=0):
+        scale, zero_point = self.input["quantization"]
+        if scale:
+            batch = np.clip(np.round(batch / scale + zero_point), *_int_range(self.input["dtype"]))
+        batch = batch.astype(self.input["dtype"])
+        with self.lock:
+            self._resize(len(batch))
+            self.interpreter.set_tensor(self.input["index"], batch)
+            self.interpreter.invoke()
+            preds = self.interpreter.get_tensor(self.output["index"])
+        scale, zero_point = self.output["quantization"]
+        if scale:
+            preds = (preds.astype(np.float32) - zero_point) * scale
+        return preds
+
+
+def _int_range(dtype):
+    info = np.iinfo(dtype)
+    return info.min, info.max
+
+
+def load_custom_model(path=None):
+    """
+    Loads the custom FER model. Without a path the converted TFLite model
+    is preferred when Config.USE_TFLITE is set and the file exists, then
+    the Keras model at Config.MODEL_PATH.
+    """
+    if not Config.USE_CUSTOM_MODEL:
+        return None
+    if path is None:
+        use_tflite = Config.USE_TFLITE and os.path.exists(Config.TFLITE_MODEL_PATH)
+        path = Config.TFLITE_MODEL_PATH if use_tflite else Config.MODEL_PATH
+    try:
+        if os.path.exists(path):
+            if path.endswith(".tflite"):
+                model = TFLiteModel(path)
+                print(f"✅ Custom FER Model Loaded (TFLite: {os.path.basename(path)}).")
+                return model
+            from tensorflow.keras.models import load_model
+            model = load_model(path, compile=False)
+            print("✅ Custom FER Model Loaded.")
+            return model
+        print(f"⚠️ Custom model not found at {path}. Using DeepFace only.")
+    except Exception as e:
+        print(f"❌ Error loading custom model: {e}")
+    return None
+
+
+def preprocess_batch(custom_model, face_imgs):
+    """
+    Resizes and normalizes crops into a single (N, 48, 48, C) float tensor,
+    with C taken from the model's input shape.
+    """
+    channels = custom_model.input_shape[-1] or 3
+    batch = np.empty((len(face_imgs), 48, 48, channels), dtype=np.float32)
+    for i, face_img in enumerate(face_imgs):
+        roi = cv2.resize(face_img, (48, 48))
+        if channels == 1:
+            roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)[..., None]
+        batch[i] = roi
+    batch /= 255.0
+    return batch
+
+
+def deepface_probs(face_img):
+    try:
+        from deepface import DeepFace
+        result = DeepFace.analyze(face_img, actions=['emotion'], enforce_detection=False, silent=True)
+        if result and isinstance(result, list) and len(result) > 0:
+            emotion_data = result[0].get('emotion', {})
+            probs = {k.lower(): float(v)/100.0 for k, v in emotion_data.items()}
+            probs.pop('disgust', None)
+            return probs
+    except Exception as e:
+        print(f"DeepFace analysis error: {e}")
+    return {}
+
+
+def predict_batch(custom_model, face_imgs):
+    """
+    Returns one {emotion: probability} dict per face crop. The custom model
+    scores all crops in a single predict() call; without it each crop goes
+    through DeepFace. A dict is empty if inference failed for that crop.
+    """
+    if not face_imgs:
+        return []
+
+    if custom_model:
+        preds = custom_model.predict(preprocess_batch(custom_model, face_imgs), verbose=0)
+        return [{label: float(prob) for label, prob in zip(Config.EMOTIONS, row)} for row in preds]
+
+    if not Config.USE_DEEPFACE:
+        return [{} for _ in face_imgs]
+    return [deepface_probs(face_img) for face_img in face_imgs]
+
+
+def needs_escalation(probs, expected=None):
+    """
+    True if a custom-model prediction is too uncertain to trust: low top-1
+    confidence, a small margin to the runner-up, or a label that disagrees
+    with the face's current smoothed label.
+    """
+    ranked = sorted(probs.values(), reverse=True)
+    if not ranked or ranked[0] < Config.CASCADE_MIN_CONFIDENCE:
+        return True
+    if len(ranked) > 1 and ranked[0] - ranked[1] < Config.CASCADE_MIN_MARGIN:
+        return True
+    return Config.CASCADE_ON_DISAGREEMENT and expected is not None and max(probs, key=probs.get) != expected
+
+
+def cascade_batch(custom_model, face_imgs, expected=None):
+    """
+    Custom model first, DeepFace as a second opinion. Crops whose custom
+    prediction needs_escalation() (at most Config.CASCADE_MAX_ESCALATIONS
+    per batch, least confident first) are re-scored by DeepFace.
+
+    expected holds each face's current smoothed label (or None). Returns
+    (results, escalated) with one flag per crop.
+    """
+    results = predict_batch(custom_model, face_imgs)
+    escalated = [False] * len(results)
+    if not (custom_model and Config.CASCADE and Config.USE_DEEPFACE):
+        return results, escalated
+
+    expected = expected or [None] * len(results)
+    candidates = [i for i, probs in enumerate(results) if probs and needs_escalation(probs, expected[i])]
+    candidates.sort(key=lambda i: max(results[i].values()))
+    for i in candidates[:Config.CASCADE_MAX_ESCALATIONS]:
+        probs = deepface_probs(face_imgs[i])
+        if probs:
+            results[i] = probs
+            escalated[i] = True
+    return results, escalated
+
+
+def warm_up(custom_model):
+    """
+    Runs one dummy prediction so graph building and model downloads happen
+    now instead of on the first real face.
+    """
+    blank = np.zeros((48, 48, 3), dtype=np.uint8)
+    predict_batch(custom_model, [blank])
+    if custom_model and Config.CASCADE and Config.USE_DEEPFACE:
+        deepface_probs(blank)
+
+
+class LocalBackend:
+    """Runs inference in the calling thread of this process."""
+    def __init__(self):
+        self.custom_model = load_custom_model()
+
+    def predict_batch(self, face_imgs, expected=None):
+        """Returns (results, escalated) for the crops; see cascade_batch()."""
+        return cascade_batch(self.custom_model, face_imgs, expected)
+
+    def warm_up(self):
+        warm_up(self.custom_model)
+
+    def close(self):
+        pass
+
+
+def _worker_main(conn, shm_name, max_faces, crop_size):
+    """Entry point of an inference process: load models once, then serve batches."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((max_faces, crop_size, crop_size, 3), dtype=np.uint8, buffer=shm.buf)
+    custom_model = load_custom_model()
+    warm_up(custom_model)
+    conn.send("ready")
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            shapes, expected = request
+            try:
+                crops = [slots[i, :h, :w].copy() for i, (h, w) in enumerate(shapes)]
+                conn.send(cascade_batch(custom_model, crops, expected))
+            except Exception as e:
+                print(f"Inference worker error: {e}")
+                conn.send(([{} for _ in shapes], [False] * len(shapes)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del slots
+        shm.close()
+
+
+class ProcessBackend:
+    """
+    Runs inference in separate processes so model pre/post-processing does
+    not compete with the render loop for the GIL.
+
+    Each worker loads the models once and owns a shared-memory block with
+    room for max_faces crops. Crops are copied into it (downscaled to at most
+    crop_size) and only their shapes go through the pipe; the probabilities
+    come back the same way. predict_batch() blocks the calling analyzer
+    thread, not the render loop.
+    """
+    def __init__(self, num_workers=1, max_faces=Config.MAX_FACES, crop_size=Config.INFERENCE_CROP_SIZE):
+        ctx = mp.get_context("spawn")
+        self.max_faces = max_faces
+        self.crop_size = crop_size
+        self.idle = Queue()
+        self.workers = []
+        for _ in range(max(1, num_workers)):
+            shm = shared_memory.SharedMemory(create=True, size=max_faces * crop_size * crop_size * 3)
+            slots = np.ndarray((max_faces, crop_size, crop_size, 3), dtype=np.uint8, buffer=shm.buf)
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=_worker_main, args=(child_conn, shm.name, max_faces, crop_size),
+                               daemon=True)
+            proc.start()
+            worker = {"proc": proc, "conn": parent_conn, "shm": shm, "slots": slots}
+            self.workers.append(worker)
+
+        for worker in self.workers:
+            try:
+                worker["conn"].recv()  # wait until models are loaded
+            except EOFError:
+                self.close()
+                raise RuntimeError("Inference worker process failed to start")
+            self.idle.put(worker)
+        print(f"✅ Inference process pool ready ({len(self.workers)} workers)")
+
+    def _fit(self, face_img):
+        h, w = face_img.shape[:2]
+        scale = min(1.0, self.crop_size / max(h, w))
+        if scale < 1.0:
+            face_img = cv2.resize(face_img, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                  interpolation=cv2.INTER_AREA)
+        return face_img
+
+    def predict_batch(self, face_imgs, expected=None):
+        face_imgs = [self._fit(f) for f in face_imgs[:self.max_faces]]
+        if not face_imgs:
+            return [], []
+
+        worker = self.idle.get()
+        try:
+            shapes = []
+            for i, face_img in enumerate(face_imgs):
+                h, w = face_img.shape[:2]
+                worker["slots"][i, :h, :w] = face_img
+                shapes.append((h, w))
+            worker["conn"].send((shapes, expected))
+            return worker["conn"].recv()
+        finally:
+            self.idle.put(worker)
+
+    def warm_up(self):
+        pass  # workers warm up before reporting ready
+
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker["conn"].send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            worker["proc"].join(timeout=2.0)
+            if worker["proc"].is_alive():
+                worker["proc"].terminate()
+            worker["slots"] = None
+            worker["shm"].close()
+            worker["shm"].unlink()
+        self.workers = []
+
+
+def create_backend(name=Config.ANALYSIS_BACKEND, num_workers=1):
+    if name == "process":
+        return ProcessBackend(num_workers=num_workers)
+    return LocalBackend()
@@ -0,0 +1,44 @@
+"""
+Cheap tile-wise motion detection used to skip segmentation on static scenes
+"""
+import cv2
+import numpy as np
+from src.config import Config
+from src.core.frame import Frame
+
+
+class MotionGate:
+    """
+    Compares a small grayscale copy of each frame with a reference copy,
+    taken the last time the segmenter ran, on a grid of tiles x tiles.
+
+    moved() is True when the mean absolute difference of any tile exceeds
+    threshold (in gray levels). Per-tile scoring catches a person moving in
+    one corner that a whole-frame average would dilute.
+    """
+    def __init__(self, width=Config.MOTION_WIDTH, tiles=Config.MOTION_TILES, threshold=Config.MOTION_THRESHOLD):
+        self.width = width
+        self.tiles = tiles
+        self.threshold = threshold
+        self.reference = None
+        self.last_score = 0.0
+
+    def _small(self, frame):
+        if not isinstance(frame, Frame):
+            frame = Frame(frame)
+        return frame.scaled(self.width).gray
+
+    def moved(self, frame):
+        small = self._small(frame)
+        if self.reference is None or self.reference.shape != small.shape:
+            self.last_score = float("inf")
+            return True
+        diff = cv2.absdiff(small, self.reference)
+        # INTER_AREA downsizing to the tile grid averages each tile
+        tile_means = cv2.resize(diff, (self.tiles, self.tiles), interpolation=cv2.INTER_AREA)
+        self.last_score = float(np.max(tile_means))
+        return self.last_score > self.threshold
+
+    def reset(self, frame):
+        """Makes frame the new reference (call after running the segmenter on it)."""
+        self.reference = self._small(frame)
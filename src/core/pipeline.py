@@ -0,0 +1,114 @@
+"""
+Pipelined frame processing: one thread per stage linked by bounded queues
+"""
+import time
+import threading
+from queue import Empty
+
+from src.utils.queues import DropOldestQueue
+
+
+class FramePacket:
+    """A Frame plus the metadata that travels with it between stages."""
+    def __init__(self, index, frame):
+        self.index = index
+        self.frame = frame
+        self.started = time.perf_counter()
+        self.faces = []         # (x, y, w, h) per detected face
+        self.face_imgs = []     # matching crops
+        self.face_emotions = [] # matching stable emotion labels
+        self.emotion = None     # primary face, drives HUD and background
+        self.probs = None
+        self.result_frame = None     # index of the frame the emotion result came from
+        self.result_captured = None  # capture timestamp of that frame
+        self.timings = {}
+
+
+class Pipeline:
+    """
+    Runs capture and each processing stage on its own thread.
+
+    source() returns the next FramePacket (None when the input is finished).
+    stages is a list of (name, fn); each fn takes a packet and returns it
+    (or None to drop it). Every stage has exactly one thread, so packets
+    leave the pipeline in capture order. Queues between stages hold at most
+    queue_size packets; when full they either drop the oldest packet or
+    block the upstream stage, depending on drop_oldest.
+
+    OpenCV and MediaPipe release the GIL while they work, so the stages
+    overlap on multi-core machines.
+    """
+    _END = object()
+
+    def __init__(self, source, stages, queue_size=2, drop_oldest=True):
+        self.source = source
+        self.stages = stages
+        self.queues = [DropOldestQueue(queue_size, drop_oldest) for _ in range(len(stages) + 1)]
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def start(self):
+        workers = [("capture", self._capture, ())]
+        for i, (name, fn) in enumerate(self.stages):
+            workers.append((name, self._run_stage, (name, fn, self.queues[i], self.queues[i + 1])))
+        for name, target, args in workers:
+            t = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+            t.start()
+            self.threads.append(t)
+        return self
+
+    def _put(self, q, item):
+        # Blocking queues are polled so stop() can always unblock producers
+        while not self.stopped.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except TimeoutError:
+                continue
+
+    def _capture(self):
+        try:
+            while not self.stopped.is_set():
+                packet = self.source()
+                if packet is None:
+                    break
+                self._put(self.queues[0], packet)
+        finally:
+            self._put(self.queues[0], self._END)
+
+    def _run_stage(self, name, fn, inbox, outbox):
+        while not self.stopped.is_set():
+            try:
+                packet = inbox.get(timeout=0.1)
+            except Empty:
+                continue
+            if packet is self._END:
+                self._put(outbox, self._END)
+                return
+            try:
+                packet = fn(packet)
+            except Exception as e:
+                print(f"Pipeline stage '{name}' error: {e}")
+                packet = None
+            if packet is not None:
+                self._put(outbox, packet)
+
+    def get(self, timeout=None):
+        """
+        Returns the next fully processed packet, or None once the source is
+        exhausted. Raises queue.Empty if nothing arrives within timeout.
+        """
+        packet = self.queues[-1].get(timeout=timeout)
+        return None if packet is self._END else packet
+
+    def stats(self):
+        """Queue depth and dropped packet count per stage input."""
+        names = [name for name, _ in self.stages] + ["output"]
+        return {name: {"depth": q.qsize(), "dropped": q.dropped} for name, q in zip(names, self.queues)}
+
+    def stop(self):
+        self.stopped.set()
+        for q in self.queues:
+            q.close()
+        for t in self.threads:
+            t.join(timeout=1.0)
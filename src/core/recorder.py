@@ -0,0 +1,149 @@
+"""
+Asynchronous video recorder with rolling output files
+"""
+import os
+import time
+import threading
+from queue import Empty
+
+import cv2
+from src.config import Config
+from src.utils.queues import DropOldestQueue
+
+
+class Recorder:
+    """
+    Writes frames to video files on a background thread.
+
+    write() only queues the frame, so a slow disk or encoder never stalls
+    the caller. The queue is bounded; when the writer falls behind the
+    oldest queued frames are dropped and counted.
+
+    The writer is opened with the frame rate measured from the capture
+    timestamps of the first fps_probe frames of each file, so playback runs
+    at the speed the app actually produced. Files roll over to a new part
+    once they reach max_seconds of video or max_mb on disk (0 = no limit).
+    With size=(width, height) frames are scaled on the writer thread to fit
+    inside it, keeping their aspect ratio.
+    """
+    def __init__(self, prefix="recording", fourcc=Config.RECORD_FOURCC, ext=Config.RECORD_EXTENSION,
+                 queue_size=Config.RECORD_QUEUE_SIZE, max_seconds=Config.RECORD_MAX_SECONDS,
+                 max_mb=Config.RECORD_MAX_MB, fps_probe=Config.RECORD_FPS_PROBE,
+                 size=(Config.RECORD_WIDTH, Config.RECORD_HEIGHT)):
+        self.prefix = f"{prefix}_{int(time.time())}"
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.ext = ext
+        self.max_seconds = max_seconds
+        self.max_bytes = max_mb * 1024 * 1024
+        self.fps_probe = max(2, fps_probe)
+        self.size = tuple(size) if size and all(size) else None
+        self.queue = DropOldestQueue(maxsize=queue_size, drop_oldest=True)
+        self.thread = None
+
+        self.writer = None
+        self.frame_size = None
+        self.pending = []
+        self.fps = None
+        self.segment_frames = 0
+        self.files = []
+        self.frames_written = 0
+        self.max_depth = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, frame, timestamp=None):
+        """Queues a BGR frame; the caller must not modify it afterwards."""
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        self.queue.put((frame, timestamp))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        while True:
+            try:
+                frame, timestamp = self.queue.get(timeout=0.5)
+            except Empty:
+                if self.queue.closed:
+                    break
+                continue
+            try:
+                self._handle(frame, timestamp)
+            except Exception as e:
+                print(f"Recorder error: {e}")
+        try:
+            self._flush_pending()
+        except Exception as e:
+            print(f"Recorder error: {e}")
+        self._close_segment()
+
+    def _handle(self, frame, timestamp):
+        if self.writer is None:
+            # Collect a few frames to measure the real frame rate first
+            self.pending.append((frame, timestamp))
+            if len(self.pending) >= self.fps_probe:
+                self._flush_pending()
+            return
+
+        self._write(frame)
+        if self._segment_full():
+            self._close_segment()
+
+    def _flush_pending(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        span = pending[-1][1] - pending[0][1]
+        fps = (len(pending) - 1) / span if span > 0 else Config.FPS
+        self.fps = min(max(1.0, fps), float(Config.FPS))
+        self._open_segment(pending[0][0])
+        for frame, _ in pending:
+            self._write(frame)
+
+    def _open_segment(self, frame):
+        h, w = frame.shape[:2]
+        self.frame_size = (w, h)
+        if self.size:
+            scale = min(self.size[0] / w, self.size[1] / h)
+            self.frame_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        path = f"{self.prefix}_{len(self.files):03d}{self.ext}"
+        self.writer = cv2.VideoWriter(path, self.fourcc, self.fps, self.frame_size)
+        if not self.writer.isOpened():
+            self.writer = None
+            raise IOError(f"Could not open video writer: {path}")
+        self.files.append(path)
+        self.segment_frames = 0
+        print(f"🔴 Recording to {path} ({self.fps:.1f} fps)")
+
+    def _write(self, frame):
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+        self.segment_frames += 1
+        self.frames_written += 1
+
+    def _segment_full(self):
+        if self.max_seconds and self.segment_frames >= self.max_seconds * self.fps:
+            return True
+        # Checking the file size once per second of video is plenty
+        if self.max_bytes and self.segment_frames % max(1, int(self.fps)) == 0:
+            return os.path.getsize(self.files[-1]) >= self.max_bytes
+        return False
+
+    def _close_segment(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+    def stats(self):
+        return {"written": self.frames_written, "dropped": self.queue.dropped,
+                "queued": self.queue.qsize(), "max_depth": self.max_depth, "files": list(self.files)}
+
+    def stop(self, timeout=10.0):
+        """Writes out the frames still queued and closes the current file."""
+        self.queue.close()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.stats()
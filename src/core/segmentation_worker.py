@@ -0,0 +1,193 @@
+"""
+Person segmentation in a separate process
+
+Frames go to the worker and masks come back through shared-memory double
+buffers: the writer fills the slot nobody is reading, then publishes it by
+flipping the slot index and bumping a sequence number under a lock. Neither
+side ever waits for the other; the render loop submits its newest frame
+and composites with the newest mask that has arrived.
+"""
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from src.config import Config
+from src.core.frame import Frame
+
+# Header fields (int64): latest input and output as (seq, slot, h, w), plus counters
+IN_SEQ, IN_SLOT, IN_H, IN_W = 0, 1, 2, 3
+OUT_SEQ, OUT_SLOT, OUT_H, OUT_W = 4, 5, 6, 7
+TAKEN, FAILED = 8, 9
+HEADER_FIELDS = 10
+
+
+class SharedBuffers:
+    """Header, two BGR frame slots and two mask slots in one shared-memory block."""
+    def __init__(self, width, height, name=None):
+        header = HEADER_FIELDS * 8
+        frames = 2 * height * width * 3
+        size = header + frames + 2 * height * width
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buf)
+        self.frames = np.ndarray((2, height, width, 3), dtype=np.uint8, buffer=buf, offset=header)
+        self.masks = np.ndarray((2, height, width), dtype=np.uint8, buffer=buf, offset=header + frames)
+        self.width = width
+        self.height = height
+
+    def close(self, unlink=False):
+        self.header = self.frames = self.masks = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _worker_main(shm_name, width, height, lock, new_frame, ready, stop, soft_mask, edge_refine):
+    """Entry point of the segmentation process: load the model once, then segment the newest frame."""
+    from src.core.background_generator import PersonSegmenter
+
+    buffers = SharedBuffers(width, height, name=shm_name)
+    segmenter = PersonSegmenter(soft_mask=soft_mask, edge_refine=edge_refine)
+    segmenter.segment(Frame(np.zeros((height, width, 3), dtype=np.uint8)))
+    ready.set()
+
+    header = buffers.header
+    last_seq = -1
+    try:
+        while not stop.is_set():
+            if not new_frame.wait(timeout=0.1):
+                continue
+            new_frame.clear()
+            with lock:
+                seq, slot, h, w = header[IN_SEQ:IN_W + 1]
+                if seq == last_seq:
+                    continue
+                bgr = buffers.frames[slot, :h, :w].copy()
+                header[TAKEN] += 1
+            last_seq = seq
+
+            try:
+                alpha = segmenter.segment(Frame(bgr))
+            except Exception as e:
+                print(f"Segmentation worker error: {e}")
+                alpha = None
+            if alpha is None:
+                with lock:
+                    header[FAILED] += 1
+                continue
+
+            # Fill the slot the parent is not reading, then publish it
+            out = 1 - header[OUT_SLOT]
+            buffers.masks[out, :h, :w] = alpha
+            with lock:
+                header[OUT_SEQ:OUT_W + 1] = (seq, out, h, w)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del header
+        buffers.close()
+
+
+class SegmentationWorker:
+    """
+    Runs PersonSegmenter in a spawned process.
+
+    start() sizes the shared buffers for frames up to width x height (the
+    processing frame, so a smaller adaptive segmentation width always fits).
+    submit() never blocks: a frame the worker has not picked up yet is
+    simply replaced by the newer one. latest() returns the newest mask
+    without waiting, or None when nothing newer than after_seq arrived.
+    """
+    def __init__(self, soft_mask=Config.SEGMENTATION_SOFT_MASK, edge_refine=Config.SEGMENTATION_EDGE_REFINE,
+                 ready_timeout=30.0):
+        self.soft_mask = soft_mask
+        self.edge_refine = edge_refine
+        self.ready_timeout = ready_timeout
+        self.buffers = None
+        self.proc = None
+        self.submitted = 0
+        self.received = 0
+
+    def start(self, width, height, wait=False):
+        """Starts (or resizes) the worker; returns True if a new process was started."""
+        if self.proc is not None and width <= self.buffers.width and height <= self.buffers.height:
+            return False
+        self.stop()
+        self.submitted = 0
+        self.received = 0
+
+        ctx = mp.get_context("spawn")
+        self.buffers = SharedBuffers(width, height)
+        self.buffers.header[:] = 0
+        self.buffers.header[IN_SEQ] = self.buffers.header[OUT_SEQ] = -1
+        self.lock = ctx.Lock()
+        self.new_frame = ctx.Event()
+        self.ready = ctx.Event()
+        self.stop_event = ctx.Event()
+        self.proc = ctx.Process(target=_worker_main,
+                                args=(self.buffers.shm.name, width, height, self.lock, self.new_frame,
+                                      self.ready, self.stop_event, self.soft_mask, self.edge_refine),
+                                daemon=True)
+        self.proc.start()
+        if wait:
+            self.wait_ready()
+        return True
+
+    def wait_ready(self):
+        if not self.ready.wait(timeout=self.ready_timeout) or not self.proc.is_alive():
+            self.stop()
+            raise RuntimeError("Segmentation worker process failed to start")
+        print("✅ Segmentation worker ready")
+
+    def submit(self, frame):
+        """Hands a Frame (or BGR array) to the worker; returns False if it does not fit."""
+        bgr = frame.bgr if isinstance(frame, Frame) else frame
+        h, w = bgr.shape[:2]
+        if self.proc is None or h > self.buffers.height or w > self.buffers.width:
+            return False
+
+        header = self.buffers.header
+        slot = 1 - header[IN_SLOT]
+        self.buffers.frames[slot, :h, :w] = bgr
+        with self.lock:
+            header[IN_SEQ:IN_W + 1] = (self.submitted, slot, h, w)
+        self.submitted += 1
+        self.new_frame.set()
+        return True
+
+    def latest(self, after_seq=-1):
+        """Returns (seq, mask) for the newest mask past after_seq, or None."""
+        if self.proc is None:
+            return None
+        header = self.buffers.header
+        with self.lock:
+            seq, slot, h, w = header[OUT_SEQ:OUT_W + 1]
+            if seq <= after_seq:
+                return None
+            mask = self.buffers.masks[slot, :h, :w].copy()
+        self.received += 1
+        return int(seq), mask
+
+    def stats(self):
+        """Frames submitted, picked up by the worker, lost to newer ones, and masks received."""
+        if self.buffers is None:
+            return {"submitted": self.submitted}
+        with self.lock:
+            taken, failed = int(self.buffers.header[TAKEN]), int(self.buffers.header[FAILED])
+        return {"submitted": self.submitted, "segmented": taken - failed, "failed": failed,
+                "replaced": self.submitted - taken, "received": self.received,
+                "alive": self.proc is not None and self.proc.is_alive()}
+
+    def stop(self):
+        if self.proc is None:
+            return
+        self.stop_event.set()
+        self.new_frame.set()
+        self.proc.join(timeout=2.0)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.proc = None
+        self.buffers.close(unlink=True)
+        self.buffers = None
@@ -0,0 +1,159 @@
+"""
+Vectorized temporal stabilization of emotion predictions for many subjects
+"""
+import numpy as np
+from src.config import Config
+
+
+class Stabilizer:
+    """
+    Holds per-subject smoothing state as rows of (subjects, emotions) arrays
+    so that a whole batch of faces is updated with a few NumPy operations.
+
+    update() applies an exponential moving average (weight alpha for the new
+    prediction) and label hysteresis: the stable label only switches after
+    the smoothed top emotion has differed from it for `hold` consecutive
+    updates.
+
+    vote() feeds a sliding window of `window` labels per subject with
+    running counts, so majority() is O(1) per vote instead of recounting
+    the window.
+
+    Subjects are identified by any hashable key (track id, stream name) and
+    get a row on first use; forget() frees rows of subjects not seen for a
+    while. Not thread-safe: callers serialize access.
+    """
+    def __init__(self, labels=Config.EMOTIONS, alpha=0.25, hold=3, window=15, capacity=16,
+                 default="neutral"):
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.alpha = alpha
+        self.hold_threshold = hold
+        self.window = window
+        self.default = self.index.get(default, 0)
+        self.rows = {}   # key -> row
+        self.free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        n = len(self.labels)
+        self.capacity = capacity
+        self.smoothed = np.zeros((capacity, n), dtype=np.float32)
+        self.initialized = np.zeros(capacity, dtype=bool)
+        self.stable = np.full(capacity, self.default, dtype=np.int32)
+        self.hold = np.zeros(capacity, dtype=np.int32)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.votes = np.full((capacity, self.window), -1, dtype=np.int32)
+        self.vote_pos = np.zeros(capacity, dtype=np.int32)
+        self.vote_count = np.zeros(capacity, dtype=np.int32)
+        self.counts = np.zeros((capacity, n), dtype=np.int32)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = (self.smoothed, self.initialized, self.stable, self.hold, self.last_seen,
+               self.votes, self.vote_pos, self.vote_count, self.counts)
+        size = self.capacity
+        self._allocate(size * 2)
+        for new, arr in zip((self.smoothed, self.initialized, self.stable, self.hold, self.last_seen,
+                             self.votes, self.vote_pos, self.vote_count, self.counts), old):
+            new[:size] = arr
+        self.free = list(range(self.capacity - 1, size - 1, -1))
+
+    def _rows(self, keys):
+        rows = np.empty(len(keys), dtype=np.intp)
+        for i, key in enumerate(keys):
+            row = self.rows.get(key)
+            if row is None:
+                if not self.free:
+                    self._grow()
+                row = self.rows[key] = self.free.pop()
+            rows[i] = row
+        return rows
+
+    def to_array(self, probs_list):
+        """Stacks {emotion: prob} dicts into an (N, emotions) array (missing = 0)."""
+        return np.array([[p.get(label, 0.0) for label in self.labels] for p in probs_list],
+                        dtype=np.float32).reshape(len(probs_list), len(self.labels))
+
+    def update(self, keys, probs, now=0.0):
+        """
+        Smooths one prediction per key; probs is an (N, emotions) array and
+        keys must be unique. Returns the stable label index per key.
+        """
+        rows = self._rows(keys)
+        probs = np.asarray(probs, dtype=np.float32)
+
+        first = ~self.initialized[rows]
+        blended = self.alpha * probs + (1 - self.alpha) * self.smoothed[rows]
+        self.smoothed[rows] = np.where(first[:, None], probs, blended)
+        self.initialized[rows] = True
+        self.last_seen[rows] = now
+
+        top = self.smoothed[rows].argmax(axis=1)
+        differs = top != self.stable[rows]
+        hold = np.where(differs, self.hold[rows] + 1, 0)
+        switch = hold >= self.hold_threshold
+        self.stable[rows] = np.where(switch, top, self.stable[rows])
+        self.hold[rows] = np.where(switch, 0, hold)
+        return self.stable[rows]
+
+    def vote(self, keys, labels, now=0.0):
+        """Adds one label index per key to its sliding window; keys must be unique."""
+        rows = self._rows(keys)
+        labels = np.asarray(labels, dtype=np.int32)
+        pos = self.vote_pos[rows]
+
+        evicted = self.votes[rows, pos]
+        full = evicted >= 0
+        np.subtract.at(self.counts, (rows[full], evicted[full]), 1)
+        np.add.at(self.counts, (rows, labels), 1)
+
+        self.votes[rows, pos] = labels
+        self.vote_pos[rows] = (pos + 1) % self.window
+        self.vote_count[rows] = np.minimum(self.vote_count[rows] + 1, self.window)
+        self.last_seen[rows] = now
+
+    def majority(self, key):
+        """Most frequent label in key's window, or None until the window is full."""
+        row = self.rows.get(key)
+        if row is None or self.vote_count[row] < self.window:
+            return None
+        return self.labels[int(self.counts[row].argmax())]
+
+    def stable_label(self, key):
+        row = self.rows.get(key)
+        if row is None or not self.initialized[row]:
+            return None
+        return self.labels[self.stable[row]]
+
+    def result(self, key):
+        """(stable label, {emotion: smoothed prob}) for key."""
+        row = self.rows[key]
+        probs = dict(zip(self.labels, self.smoothed[row].tolist()))
+        return self.labels[self.stable[row]], probs
+
+    def forget(self, before):
+        """Frees subjects last updated before `before`; returns their keys."""
+        if not self.rows:
+            return []
+        keys = list(self.rows)
+        rows = np.fromiter(self.rows.values(), dtype=np.intp, count=len(keys))
+        expired = np.flatnonzero(self.last_seen[rows] < before)
+        forgotten = []
+        for i in expired:
+            key, row = keys[i], rows[i]
+            del self.rows[key]
+            self._reset(row)
+            self.free.append(row)
+            forgotten.append(key)
+        return forgotten
+
+    def _reset(self, row):
+        self.smoothed[row] = 0.0
+        self.initialized[row] = False
+        self.stable[row] = self.default
+        self.hold[row] = 0
+        self.votes[row] = -1
+        self.vote_pos[row] = 0
+        self.vote_count[row] = 0
+        self.counts[row] = 0
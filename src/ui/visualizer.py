@@ -2,52 +2,131 @@ import cv2
 import numpy as np
 from src.config import Config
 
+SIDEBAR_WIDTH = 301  # cv2.rectangle((0, 0), (300, h)) fills columns 0..300
+
+
+class HudLayer:
+    """
+    Prerendered HUD elements that do not change from frame to frame.
+
+    Drawing happens on an off-screen canvas while a mask records which
+    pixels were touched; paste() copies exactly those pixels into a frame.
+    HUD text uses cv2's default LINE_8 (no anti-aliasing), so pasting the
+    recorded pixels gives the same result as drawing them directly.
+    """
+    def __init__(self, h, w):
+        self.canvas = np.zeros((h, w, 3), np.uint8)
+        self.mask = np.zeros((h, w), np.uint8)
+
+    def text(self, text, org, font, scale, color, thickness):
+        cv2.putText(self.canvas, text, org, font, scale, color, thickness)
+        cv2.putText(self.mask, text, org, font, scale, 255, thickness)
+
+    def rectangle(self, pt1, pt2, color):
+        cv2.rectangle(self.canvas, pt1, pt2, color, -1)
+        cv2.rectangle(self.mask, pt1, pt2, 255, -1)
+
+    def finish(self):
+        """Crops the layer to the bounding box of what was drawn."""
+        x, y, w, h = cv2.boundingRect(self.mask)
+        self.roi = (slice(y, y + h), slice(x, x + w))
+        self.canvas = self.canvas[self.roi].copy()
+        self.mask = self.mask[self.roi].astype(bool)[..., None]
+        return self
+
+    def paste(self, frame):
+        np.copyto(frame[self.roi], self.canvas, where=self.mask)
+
+
 class Visualizer:
+    """
+    Draws the sidebar HUD, face boxes and optional diagnostics.
+
+    The sidebar's static parts (title, labels, bar backgrounds, developer
+    name) and its dark backing are cached per frame size and emotion list;
+    each frame only blends the sidebar region and draws the changing values.
+    """
     def __init__(self):
         self.font = cv2.FONT_HERSHEY_SIMPLEX
-        
+        self.hud_key = None
+        self.sidebar = None
+        self.hud_under = None
+        self.hud_over = None
+
+    def _build_hud(self, h, w, emotions):
+        self.sidebar = np.full((h, min(w, SIDEBAR_WIDTH), 3), 20, np.uint8)
+
+        under = HudLayer(h, w)
+        under.text("EMOTION AI", (20, 50), self.font, 1, (255, 255, 255), 2)
+        under.text("v2.0 Pro", (220, 50), self.font, 0.5, Config.THEME_COLOR, 1)
+        under.text("DETECTED:", (20, 100), self.font, 0.6, (200, 200, 200), 1)
+        y_start = 220
+        for emo in emotions:
+            under.text(emo.capitalize(), (20, y_start), self.font, 0.6, (220, 220, 220), 1)
+            under.rectangle((100, y_start - 15), (280, y_start + 5), (50, 50, 50))
+            y_start += 40
+        self.hud_under = under.finish()
+
+        # Drawn after the bars so it stays on top where they overlap on short frames
+        over = HudLayer(h, w)
+        over.text(Config.DEV_NAME, (20, h - 40), self.font, 0.5, (150, 150, 150), 1)
+        self.hud_over = over.finish()
+
     def draw_hud(self, frame, emotion, probs, fps):
         h, w, _ = frame.shape
-        
-        # 1. Draw Sidebar Background (Semi-transparent)
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (300, h), (20, 20, 20), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-        
-        # 2. Draw Title
-        cv2.putText(frame, "EMOTION AI", (20, 50), self.font, 1, (255, 255, 255), 2)
-        cv2.putText(frame, "v2.0 Pro", (220, 50), self.font, 0.5, Config.THEME_COLOR, 1)
-        
+        key = (h, w, tuple(probs), Config.THEME_COLOR, Config.DEV_NAME)
+        if key != self.hud_key:
+            self._build_hud(h, w, probs)
+            self.hud_key = key
+
+        # 1. Darken the sidebar only (70% dark grey, 30% frame)
+        roi = frame[:, :SIDEBAR_WIDTH]
+        cv2.addWeighted(self.sidebar, 0.7, roi, 0.3, 0, roi)
+
+        # 2. Static labels and bar backgrounds
+        self.hud_under.paste(frame)
+
         # 3. Draw FPS
         cv2.putText(frame, f"FPS: {int(fps)}", (w - 120, 40), self.font, 0.7, (0, 255, 0), 2)
-        
+
         # 4. Draw Current Emotion (Large)
         color = Config.EMOTION_COLORS.get(emotion, (255, 255, 255))
-        cv2.putText(frame, "DETECTED:", (20, 100), self.font, 0.6, (200, 200, 200), 1)
         cv2.putText(frame, emotion.upper(), (20, 150), self.font, 1.5, color, 3)
-        
+
         # 5. Draw Probability Bars
         y_start = 220
-        for i, (emo, prob) in enumerate(probs.items()):
-            # Label
-            cv2.putText(frame, emo.capitalize(), (20, y_start), self.font, 0.6, (220, 220, 220), 1)
-            
-            # Bar Background
-            cv2.rectangle(frame, (100, y_start - 15), (280, y_start + 5), (50, 50, 50), -1)
-            
-            # Bar Foreground
+        for emo, prob in probs.items():
             bar_width = int(prob * 180)
             bar_color = Config.EMOTION_COLORS.get(emo, (255, 255, 255))
             cv2.rectangle(frame, (100, y_start - 15), (100 + bar_width, y_start + 5), bar_color, -1)
-            
+
             # Percentage
             cv2.putText(frame, f"{int(prob*100)}%", (290, y_start), self.font, 0.5, (255, 255, 255), 1)
-            
+
             y_start += 40
-            
-        # 6. Draw Developer Info
-        cv2.putText(frame, Config.DEV_NAME, (20, h - 40), self.font, 0.5, (150, 150, 150), 1)
-        
+
+        # 6. Developer Info
+        self.hud_over.paste(frame)
+
+    def draw_profile(self, frame, summary):
+        """Draws a per-stage p50/p95/p99 table (ms) under the FPS counter."""
+        h, w, _ = frame.shape
+        x = w - 330
+        y = 70
+        cv2.putText(frame, "stage            p50   p95   p99", (x, y), self.font, 0.45, (200, 200, 200), 1)
+        for name, s in sorted(summary.items()):
+            y += 20
+            line = f"{name[:15]:<15} {s['p50']:5.1f} {s['p95']:5.1f} {s['p99']:5.1f}"
+            cv2.putText(frame, line, (x, y), self.font, 0.45, Config.THEME_COLOR, 1)
+
+    def draw_adaptive(self, frame, decisions):
+        """Shows the adaptive controller's current settings at the bottom right."""
+        h, w, _ = frame.shape
+        width = decisions["seg_width"] or "full"
+        line = (f"L{decisions['level']}  analyze 1/{decisions['analysis_every']}  "
+                f"seg 1/{decisions['segment_every']} @{width}  "
+                f"{decisions['cost_ms']:.0f}/{decisions['budget_ms']:.0f}ms")
+        cv2.putText(frame, line, (w - 480, h - 20), self.font, 0.45, (150, 150, 150), 1)
 
     def draw_face_box(self, frame, face_coords, emotion):
         x, y, w, h = face_coords
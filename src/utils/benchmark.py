@@ -0,0 +1,62 @@
+"""
+Throughput and latency statistics for benchmark runs
+"""
+import time
+import numpy as np
+
+
+def percentile_summary(samples, percentiles=(50, 90, 95, 99)):
+    """
+    Returns {'p50': ..., 'p95': ..., 'mean': ..., 'max': ...} in milliseconds
+    for a sequence of durations given in seconds.
+    """
+    if len(samples) == 0:
+        return {}
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    summary = {f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(arr, percentiles))}
+    summary["mean"] = float(arr.mean())
+    summary["max"] = float(arr.max())
+    return summary
+
+
+class ThroughputMeter:
+    """
+    Records per-frame processing latency over a whole run and reports
+    overall frames/sec plus latency percentiles at the end.
+    """
+    def __init__(self):
+        self.latencies = []
+        self.start_time = None
+        self.end_time = None
+
+    def record(self, latency):
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start_time = now - latency
+        self.end_time = now
+        self.latencies.append(latency)
+
+    def summary(self):
+        frames = len(self.latencies)
+        elapsed = (self.end_time - self.start_time) if frames else 0.0
+        result = {
+            "frames": frames,
+            "elapsed_s": elapsed,
+            "fps": frames / elapsed if elapsed > 0 else 0.0,
+        }
+        result.update({f"latency_{k}_ms": v for k, v in percentile_summary(self.latencies).items()})
+        return result
+
+    def report(self):
+        s = self.summary()
+        print("📊 Benchmark Summary")
+        print(f"   Frames:  {s['frames']} in {s['elapsed_s']:.2f}s")
+        print(f"   FPS:     {s['fps']:.2f}")
+        if s["frames"]:
+            print(
+                "   Latency: "
+                f"p50 {s['latency_p50_ms']:.1f}ms | p90 {s['latency_p90_ms']:.1f}ms | "
+                f"p95 {s['latency_p95_ms']:.1f}ms | p99 {s['latency_p99_ms']:.1f}ms | "
+                f"max {s['latency_max_ms']:.1f}ms"
+            )
+        return s
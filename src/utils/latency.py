@@ -0,0 +1,55 @@
+"""
+Glass-to-glass latency tracking and stale-frame policy
+"""
+import time
+import threading
+from collections import deque
+
+from src.config import Config
+from src.utils.benchmark import percentile_summary
+
+
+class LatencyMonitor:
+    """
+    Measures capture-to-output latency from the capture timestamps frames
+    carry (time.perf_counter() at capture).
+
+    With a budget set, should_drop() tells a stage to skip a frame that is
+    already older than the budget so a fresher one gets through instead.
+    Frames are never dropped while nothing has been output for longer than
+    the budget, so an overloaded pipeline slows down rather than going dark.
+    """
+    def __init__(self, budget_ms=Config.LATENCY_BUDGET_MS, window=Config.PROFILE_WINDOW):
+        self.budget = budget_ms / 1000.0 if budget_ms else 0.0
+        self.samples = deque(maxlen=window)
+        self.skipped = {}
+        self.last_output = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def age(self, timestamp):
+        return time.perf_counter() - timestamp if timestamp is not None else 0.0
+
+    def should_drop(self, timestamp, stage):
+        if not self.budget or timestamp is None:
+            return False
+        now = time.perf_counter()
+        if now - timestamp <= self.budget or now - self.last_output > self.budget:
+            return False
+        with self.lock:
+            self.skipped[stage] = self.skipped.get(stage, 0) + 1
+        return True
+
+    def record_output(self, timestamp):
+        """Call right after a frame was displayed/written; returns its latency in seconds."""
+        now = time.perf_counter()
+        latency = now - timestamp if timestamp is not None else 0.0
+        with self.lock:
+            self.last_output = now
+            self.samples.append(latency)
+        return latency
+
+    def summary(self):
+        with self.lock:
+            summary = percentile_summary(list(self.samples), (50, 95, 99))
+            summary["skipped"] = dict(self.skipped)
+        return summary
@@ -0,0 +1,139 @@
+"""
+Per-stage profiler for the main loop hot path
+"""
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from src.utils.benchmark import percentile_summary
+
+
+class StageProfiler:
+    """
+    Times named stages per frame and keeps a rolling window of samples per
+    stage for p50/p95/p99 reporting. Samples can also be recorded from other
+    threads (e.g. the analyzer worker) with record().
+
+    If trace_path is set, every frame is appended to a JSONL trace as
+    {"frame": n, "t": wall_time, "stages": {name: ms}}.
+    """
+    def __init__(self, window=120, trace_path=None):
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.frame_index = 0
+        self._frame = {}
+        self.trace = open(trace_path, "a") if trace_path else None
+
+    def end_frame(self, timings=None):
+        """
+        Closes the current frame and writes the trace line. Pass timings to
+        flush a per-frame dict filled via record().
+        """
+        with self.lock:
+            # Samples recorded without a target (e.g. from the analyzer
+            # worker) are attributed to the frame closed next
+            pending, self._frame = self._frame, {}
+            if timings is None:
+                timings = pending
+            else:
+                for name, ms in pending.items():
+                    timings[name] = round(timings.get(name, 0.0) + ms, 3)
+            index = self.frame_index
+            self.frame_index += 1
+
+        if self.trace:
+            self.trace.write(json.dumps({"frame": index, "t": time.time(), "stages": timings}) + "\n")
+
+    @contextmanager
+    def stage(self, name, timings=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0, timings)
+
+    def record(self, name, seconds, timings=None):
+        with self.lock:
+            hist = self.samples.get(name)
+            if hist is None:
+                hist = self.samples[name] = deque(maxlen=self.window)
+            hist.append(seconds)
+            target = self._frame if timings is None else timings
+            target[name] = round(target.get(name, 0.0) + seconds * 1000.0, 3)
+
+    def summary(self):
+        """Returns {stage: {'p50': ms, 'p95': ms, 'p99': ms, ...}}."""
+        with self.lock:
+            snapshot = {name: list(hist) for name, hist in self.samples.items()}
+        return {name: percentile_summary(s, (50, 95, 99)) for name, s in snapshot.items()}
+
+    def report(self):
+        print("⏱️  Stage timings (ms)")
+        for name, s in sorted(self.summary().items()):
+            print(f"   {name:<18} p50 {s['p50']:7.2f} | p95 {s['p95']:7.2f} | p99 {s['p99']:7.2f}")
+
+    def close(self):
+        if self.trace:
+            self.trace.close()
+            self.trace = None
+
+
+class StartupTimer:
+    """
+    Wall-clock breakdown of application startup.
+
+    step() times a block on the calling thread; in_background() runs a
+    function on its own thread (e.g. model warm-up) and times it there.
+    wait() joins the background steps, and report() prints every step
+    plus the total since start (perf_counter time, default: now).
+    """
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.steps = {}
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.steps[name] = self.steps.get(name, 0.0) + seconds
+
+    @contextmanager
+    def step(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def in_background(self, name, fn, *args):
+        def run():
+            try:
+                with self.step(name):
+                    fn(*args)
+            except Exception as e:
+                print(f"⚠️ {name} failed: {e}")
+        t = threading.Thread(target=run, name=f"startup-{name}", daemon=True)
+        t.start()
+        self.threads.append(t)
+
+    def wait(self):
+        """Blocks until all background steps are done; the wait itself is a step."""
+        with self.step("wait for warm-up"):
+            for t in self.threads:
+                t.join()
+        self.threads = []
+
+    def summary(self):
+        with self.lock:
+            summary = {name: round(s * 1000.0, 1) for name, s in self.steps.items()}
+        summary["total"] = round((time.perf_counter() - self.start) * 1000.0, 1)
+        return summary
+
+    def report(self):
+        summary = self.summary()
+        steps = " | ".join(f"{name} {ms / 1000.0:.2f}s" for name, ms in summary.items() if name != "total")
+        print(f"⏱️  Startup {summary['total'] / 1000.0:.2f}s: {steps}")
+        return summary
@@ -0,0 +1,67 @@
+"""
+Bounded queues with explicit overflow policy
+"""
+import threading
+from collections import deque
+from queue import Empty
+
+
+class DropOldestQueue:
+    """
+    Bounded FIFO queue.
+
+    With drop_oldest=True a put() on a full queue evicts the oldest item
+    instead of blocking, so producers never stall and consumers always see
+    the freshest data. With drop_oldest=False put() blocks (backpressure).
+    A queue of maxsize=1 acts as a "latest item wins" mailbox.
+    """
+    def __init__(self, maxsize=2, drop_oldest=True):
+        self.maxsize = max(1, maxsize)
+        self.drop_oldest = drop_oldest
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item, timeout=None):
+        """
+        Adds an item. Returns the evicted item (or None). Raises TimeoutError
+        if blocking mode could not make room within timeout.
+        """
+        evicted = None
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                if self.drop_oldest:
+                    evicted = self.items.popleft()
+                    self.dropped += 1
+                elif not self.cond.wait_for(
+                    lambda: len(self.items) < self.maxsize or self.closed, timeout
+                ):
+                    raise TimeoutError("queue full")
+            self.items.append(item)
+            self.put_count += 1
+            self.cond.notify_all()
+        return evicted
+
+    def get(self, timeout=None):
+        """Removes and returns the oldest item. Raises queue.Empty on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout) or not self.items:
+                raise Empty
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def qsize(self):
+        with self.cond:
+            return len(self.items)
+
+    def close(self):
+        """Wakes up all waiters; get() on an empty closed queue raises Empty."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()